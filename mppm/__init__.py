@@ -1,5 +1,5 @@
 from .analyze import SampleblockChannelInfo
-from .audio_file_handler import AudioFile
+from .audio_file_handler import AnalysisRecord, AudioFile
 from .folder_handler import FileList
 
 __version__ = '0.1.0'
@@ -1,10 +1,162 @@
 import numpy as np
-
-np.seterr(divide="ignore", invalid="ignore")
 from soundfile import SoundFile as sf
 from soundfile import SEEK_END
 
 
+def _get_magnitude_dtype(dtype):
+    """Type that holds absolute values of a sample type without overflow."""
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return np.dtype(np.int32 if dtype.itemsize < 4 else np.int64)
+    if np.issubdtype(dtype, np.floating):
+        return dtype
+    return np.dtype(np.float64)
+
+
+def _pack_flag(mask):
+    """Convert a boolean mask per channel into a channel bitmask."""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+class AnalysisStatistics:
+    def __init__(
+        self, peaks=None, deviation=0.0, sample=None, frames=0, isComplete=True,
+    ):
+        """Threshold independent results of analyzing an audio file.
+
+        Parameters
+        ----------
+        peaks : [float], optional
+            The highest absolute sample value of each channel, None if
+            nothing was analyzed.
+        deviation : float, optional
+            The largest measured difference between channels, either of
+            sample-to-sample ratios or of gain residuals.
+        sample : [float], optional
+            The loudest sample in which no channel is zero.
+        frames : int, optional
+            Number of frames analyzed.
+        isComplete : bool, optional
+            Whether the statistics cover the whole file, so that the
+            classification for other thresholds can be derived from it.
+        """
+        self.peaks = peaks
+        self.deviation = deviation
+        self.sample = [] if sample is None else sample
+        self.frames = frames
+        self.isComplete = isComplete
+
+    @property
+    def gain(self):
+        """Estimated gain of each channel relative to the first one."""
+        if self.sample and all(self.sample):
+            return [x / self.sample[0] for x in self.sample]
+        return None
+
+    def get_flag(self, empty_threshold):
+        """Channel bitmask of channels reaching the empty threshold."""
+        if self.peaks is None:
+            return None
+        return _pack_flag(np.array(self.peaks) >= empty_threshold)
+
+    def get_correlation(self, null_threshold):
+        """Whether channels are copies of each other for a null threshold."""
+        if self.peaks is None:
+            return None
+        return len(self.peaks) < 2 or self.deviation < null_threshold
+
+
+def analyze_batch(batch, lengths, correlation="ratio"):
+    """Analyze several short files of the same channel count at once.
+
+    The results are the same as analyzing each file on its own with a
+    single sampleblock. Zero padding does not change ratios, peaks or
+    valid samples, and ratios from or into padding are zero in every
+    channel, so they add no deviation. The channels are reduced one at
+    a time, as reductions over the short channel axis are slow.
+
+    Parameters
+    ----------
+    batch : numpy ndarray
+        Files x frames x channels array, each file padded with zeros
+        after its last frame.
+    lengths : [int]
+        Number of frames of each file.
+    correlation : {'ratio', 'gain'}, optional
+        The correlation test, see SampleblockChannelInfo.
+
+    Returns
+    -------
+    [AnalysisStatistics]
+        Complete statistics of each file.
+    """
+    files, frames, channels = batch.shape
+    lengths = np.asarray(lengths)
+    if not frames:
+        return [AnalysisStatistics() for _ in range(files)]
+    index = np.arange(files)
+    magnitude = np.absolute(batch)
+    peaks = np.empty((files, channels), magnitude.dtype)
+    framepeaks = magnitude[:, :, 0].copy()
+    isValid = batch[:, :, 0] != 0
+    for c in range(channels):
+        peaks[:, c] = magnitude[:, :, c].max(axis=1)
+        if c:
+            np.maximum(framepeaks, magnitude[:, :, c], out=framepeaks)
+            isValid &= batch[:, :, c] != 0
+    framepeaks *= isValid
+    loudest = framepeaks.argmax(axis=1)
+    valid = framepeaks[index, loudest] > 0
+    samples = batch[index, loudest]
+    if channels < 2 or frames < 2:
+        deviation = np.zeros(files)
+    elif correlation == "gain":
+        deviation = _get_batch_gain_deviation(batch, samples, valid, peaks)
+    else:
+        deviation = _get_batch_ratio_deviation(batch)
+    return [
+        AnalysisStatistics(
+            peaks=peaks[i].tolist(),
+            deviation=float(deviation[i]),
+            sample=samples[i].tolist() if valid[i] else [],
+            frames=int(lengths[i]),
+        )
+        if lengths[i]
+        else AnalysisStatistics()
+        for i in index
+    ]
+
+
+def _get_batch_ratio_deviation(batch):
+    """Largest ratio deviation between adjacent channels of each file."""
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        ratios = np.nan_to_num(batch[:, 1:] / batch[:, :-1], copy=False)
+    deviation = np.zeros(len(batch))
+    difference = np.empty(ratios.shape[:2], ratios.dtype)
+    for c in range(1, batch.shape[2]):
+        with np.errstate(invalid="ignore", over="ignore"):
+            np.subtract(ratios[:, :, c], ratios[:, :, c - 1], out=difference)
+        np.absolute(difference, out=difference)
+        np.maximum(deviation, difference.max(axis=1), out=deviation)
+    return deviation
+
+
+def _get_batch_gain_deviation(batch, samples, valid, peaks):
+    """Largest gain residual between channels of each file."""
+    anchor = samples * valid[:, None]
+    residual = np.empty(batch.shape[:2], batch.dtype)
+    deviation = np.zeros(len(batch))
+    for c in range(1, batch.shape[2]):
+        np.multiply(batch[:, :, c], anchor[:, 0, None], out=residual)
+        residual -= batch[:, :, 0] * anchor[:, c, None]
+        np.absolute(residual, out=residual)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            channel = residual.max(axis=1) / np.absolute(anchor[:, 0] * anchor[:, c])
+        np.maximum(deviation, channel, out=deviation)
+    silent = ~peaks.any(axis=1)
+    return np.where(valid, deviation, np.where(silent, 0.0, np.inf))
+
+
 class SampleblockChannelInfo:
     def __init__(
         self,
@@ -15,6 +167,9 @@ class SampleblockChannelInfo:
         sample=None,
         sampleblock=None,
         noisefloor=0,
+        correlation="ratio",
+        statistics=False,
+        scale=1,
     ):
         """Analyze audio information in a single sampleblock.
 
@@ -26,6 +181,19 @@ class SampleblockChannelInfo:
             Sample value below this value are considered silent.
         sampleblock : numpy ndarray
             The sampleblock to analyze in numpy array.
+        correlation : {'ratio', 'gain'}, optional
+            How to decide whether channels are copies of each other.
+            'ratio' compares sample-to-sample ratios between channels,
+            'gain' cross-multiplies every frame with the loudest valid
+            sample, which avoids divisions and handles zero samples.
+        statistics : bool, optional
+            Keep measuring the deviation between channels after they
+            are found to be different, so that the correlation can be
+            decided later for any null threshold.
+        scale : int, optional
+            The full scale value of integer sampleblocks, e.g. 2 ** 15
+            for int16, so that they are analyzed without converting to
+            float. Thresholds, peaks and samples stay in float units.
         """
 
         self.flag = flag
@@ -34,39 +202,277 @@ class SampleblockChannelInfo:
         self.null_threshold = null_threshold
         self.empty_threshold = empty_threshold
         self.noisefloor = noisefloor
+        self.correlation = correlation
+        self.statistics = statistics
+        self.scale = scale
+        self.peaks = None
+        self.deviation = 0.0
+        self.frames = 0
+        self._buffers = {}
+        self._hasCarry = False
         self.set_info(sampleblock)
 
+    def __getstate__(self):
+        """Pickle the results only, without the scratch buffers."""
+        state = dict(self.__dict__)
+        state["_buffers"] = {}
+        state["_hasCarry"] = False
+        return state
+
     def set_info(self, sampleblock):
-        """Analyze the sampleblock."""
-        if type(sampleblock) is np.ndarray and sampleblock.size:
-            self.set_channelblock(sampleblock)
-            self.set_channels()
-            self.set_flag(sampleblock)
-            self.set_correlation(self.channelblock)
-            self.set_sample(sampleblock)
+        """Analyze the sampleblock.
+
+        Flag, correlation and sample are computed directly on the
+        frames x channels block, reusing scratch buffers between calls.
+        Only the last frame is carried over to the next sampleblock.
+        """
+        if isinstance(sampleblock, np.ndarray) and sampleblock.size:
+            self.frames += sampleblock.shape[0]
+            self.channels = sampleblock.shape[1]
+            if not sampleblock.any():
+                self._set_silence(sampleblock)
+                return
+            dtype = _get_magnitude_dtype(sampleblock.dtype)
+            magnitude = self._get_buffer("magnitude", sampleblock.shape, dtype)
+            np.absolute(sampleblock, out=magnitude, dtype=dtype)
+            self._set_peaks_from_magnitude(magnitude)
+            anchor = self.sample
+            self._set_sample_from_magnitude(sampleblock, magnitude)
+            if self.statistics or self.isCorrelated is not False:
+                deviation = self._get_deviation(sampleblock)
+                self.deviation = max(
+                    self.deviation, deviation, self._get_anchor_deviation(anchor)
+                )
+                if self.isCorrelated is not False:
+                    self.isCorrelated = (
+                        self.channels < 2 or self.deviation < self.null_threshold
+                    )
+            self.set_carry(sampleblock)
         # self.set_noisefloor(sampleblock)
 
-    def set_channelblock(self, sampleblock):
-        """Channelblock is a transposed sampleblock."""
-        self.channelblock = self._transpose(sampleblock)
+    def _set_silence(self, sampleblock):
+        """Update the analysis for a sampleblock of digital silence.
 
-    def _transpose(self, sampleblock):
-        """Exchange the x and y dimensions of sampleblock."""
-        return np.array(sampleblock).transpose(1, 0)
+        Silence changes neither flag, sample nor the deviation between
+        channels, only peaks and the carried over frame.
+        """
+        if self.peaks is None:
+            dtype = _get_magnitude_dtype(sampleblock.dtype)
+            self.peaks = np.zeros(self.channels, dtype)
+        if self.flag is None:
+            self.flag = 0
+        if self.isCorrelated is None:
+            self.isCorrelated = True
+        self.set_carry(sampleblock)
 
-    def set_channels(self):
-        """Number of channels of a sampleblock."""
-        self.channels = len(self.channelblock)
-        return self.channels
+    @property
+    def isSettled(self):
+        """Whether further sampleblocks can no longer change the verdict.
 
-    def set_flag(self, sampleblock):
-        """Flag on for channels that have sample above empty threshold."""
+        Once every channel is flagged and the channels are known to be
+        different (or there is only one), the file is a non-empty mono,
+        stereo or multichannel file regardless of what follows.
+        """
+        if not self.frames:
+            return False
+        return self.flag == (1 << self.channels) - 1 and (
+            self.channels == 1 or self.isCorrelated is False
+        )
+
+    @property
+    def gain(self):
+        """Estimated gain of each channel relative to the first one."""
+        if self.sample and all(self.sample):
+            return [x / self.sample[0] for x in self.sample]
+        return None
+
+    def get_statistics(self):
+        """Threshold independent summary of the analyzed sampleblocks."""
+        peaks = None if self.peaks is None else (self.peaks / self.scale).tolist()
+        return AnalysisStatistics(
+            peaks=peaks,
+            deviation=self.deviation,
+            sample=list(self.sample),
+            frames=self.frames,
+        )
+
+    def _get_deviation(self, sampleblock):
+        """Run the correlation test selected for this analysis."""
+        if sampleblock.shape[1] < 2:
+            return 0.0
+        if self.correlation == "gain":
+            return self._get_gain_deviation(sampleblock)
+        return self._get_ratio_deviation(sampleblock)
+
+    def _get_buffer(self, name, shape, dtype=np.float64):
+        """Return a reusable scratch array of the requested shape."""
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(size, dtype)
+        return buffer[:size].reshape(shape)
+
+    def _set_peaks_from_magnitude(self, magnitude):
+        """Track the peak of each channel and flag the audible ones."""
+        peaks = magnitude.max(axis=0)
+        if self.peaks is None:
+            self.peaks = peaks
+        else:
+            np.maximum(self.peaks, peaks, out=self.peaks)
         if self.flag is None:
             self.flag = 0
-        a = np.any(np.absolute(sampleblock) >= self.empty_threshold, axis=0).astype(int)
-        [self.flag_on(i + 1) for i, v in enumerate(a) if v]
+        self.flag |= _pack_flag(peaks >= self.empty_threshold * self.scale)
         return self.flag
 
+    def _get_ratio_deviation(self, sampleblock):
+        """Largest difference of sample-to-sample ratios between channels.
+
+        The ratio between the carried over last frame of the previous
+        sampleblock and the first frame of this one is included, so the
+        result does not depend on the blocksize.
+        """
+        frames, channels = sampleblock.shape
+        carry = self._get_carry(channels)
+        offset = 0 if carry is None else 1
+        if frames + offset < 2:
+            return 0.0
+        size = frames - 1 + offset
+        ratios = self._get_buffer("ratios", (frames, channels))[:size]
+        deviation = self._get_buffer("deviation", (frames, channels - 1))[:size]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            if offset:
+                np.divide(sampleblock[0], carry, out=ratios[0])
+            np.divide(sampleblock[1:], sampleblock[:-1], out=ratios[offset:])
+            np.nan_to_num(ratios, copy=False)
+            np.subtract(ratios[:, 1:], ratios[:, :-1], out=deviation)
+        np.absolute(deviation, out=deviation)
+        return float(deviation.max())
+
+    def _get_carry(self, channels):
+        """The last frame of the previous sampleblock, if there is one."""
+        if not self._hasCarry:
+            return None
+        return self._buffers["carry"][:channels]
+
+    def set_carry(self, sampleblock):
+        """Keep a copy of the last frame for the next sampleblock.
+
+        Also used to start the analysis of a range of frames from the
+        frame before it, without analyzing that frame.
+        """
+        carry = self._get_buffer("carry", sampleblock.shape[1:], sampleblock.dtype)
+        carry[:] = sampleblock[-1]
+        self._hasCarry = True
+
+    def reset_carry(self):
+        """Forget the last frame, e.g. before analyzing a distant position."""
+        self._hasCarry = False
+
+    def merge(self, other):
+        """Combine with the analysis of the frames following these ones.
+
+        The flags are combined, the correlation holds only if it holds
+        for both and their anchor samples agree, and the loudest valid
+        sample is kept. If other was started from the last frame
+        analyzed here, see set_carry, the result is the same as
+        analyzing all frames in one pass with the 'ratio' correlation.
+
+        Parameters
+        ----------
+        other : SampleblockChannelInfo
+            Analysis of the following frames, with the same thresholds
+            and scale.
+        """
+        if not other.frames:
+            return
+        if not self.frames:
+            self.channels = other.channels
+        if other.peaks is not None:
+            if self.peaks is None:
+                self.peaks = other.peaks.copy()
+            else:
+                np.maximum(self.peaks, other.peaks, out=self.peaks)
+        if other.flag is not None:
+            self.flag = (self.flag or 0) | other.flag
+        if other._get_sample_peak() > self._get_sample_peak():
+            anchor = self.sample
+            self.sample = list(other.sample)
+        else:
+            anchor = other.sample
+        deviation = self._get_anchor_deviation(anchor)
+        self.deviation = max(self.deviation, other.deviation, deviation)
+        if other.isCorrelated is False or self.isCorrelated is None:
+            self.isCorrelated = other.isCorrelated
+        if deviation >= self.null_threshold:
+            self.isCorrelated = False
+        self.frames += other.frames
+        if other._hasCarry:
+            self.set_carry(other._get_carry(other.channels)[np.newaxis])
+
+    def _get_gain_deviation(self, sampleblock):
+        """Largest residual of channels being scaled copies of the first one.
+
+        Every frame x is cross-multiplied with the anchor sample a, the
+        loudest frame in which no channel is zero, and the residual
+        x[c] * a[0] - x[0] * a[c] is measured relative to a[0] * a[c].
+        Without an anchor, channels can only be copies if the block is
+        silent.
+        """
+        if not self.sample or not all(self.sample):
+            return 0.0 if not sampleblock.any() else float("inf")
+        anchor = np.array(self.sample, dtype=np.float64) * self.scale
+        reference = self._get_buffer("reference", sampleblock.shape)
+        residual = self._get_buffer("residual", sampleblock.shape)
+        np.multiply(sampleblock[:, :1], anchor, out=reference)
+        np.multiply(sampleblock, anchor[0], out=residual)
+        np.subtract(residual, reference, out=residual)
+        np.absolute(residual, out=residual)
+        scale = np.absolute(anchor[0] * anchor)
+        return float((residual.max(axis=0) / scale).max())
+
+    def _get_anchor_deviation(self, anchor):
+        """Residual of an earlier anchor sample against the current one.
+
+        The frames measured against an anchor that was replaced by a
+        louder one are scaled copies of it within the deviation found so
+        far, so checking the replaced anchor covers them as well.
+        """
+        if (
+            self.correlation != "gain"
+            or not anchor
+            or not all(anchor)
+            or anchor == self.sample
+        ):
+            return 0.0
+        frame = np.array([anchor], dtype=np.float64) * self.scale
+        return self._get_gain_deviation(frame)
+
+    def _set_sample_from_magnitude(self, sampleblock, magnitude):
+        """Keep the loudest frame in which every channel is non-zero."""
+        frames = sampleblock.shape[0]
+        peaks = self._get_buffer("framepeaks", (frames,), magnitude.dtype)
+        valid = self._get_buffer("valid", (frames,), np.bool_)
+        np.max(magnitude, axis=1, out=peaks)
+        np.all(sampleblock, axis=1, out=valid)
+        np.multiply(peaks, valid, out=peaks)
+        index = peaks.argmax()
+        if peaks[index] > self._get_sample_peak() * self.scale:
+            sample = sampleblock[index]
+            if self.scale != 1:
+                sample = sample / self.scale
+            self.sample = sample.tolist()
+        return self.sample
+
+    def _get_sample_peak(self):
+        """Highest absolute value of the current sample, if it is valid."""
+        if self.sample and all(self.sample):
+            return max(abs(x) for x in self.sample)
+        return 0
+
+    def set_flag(self, sampleblock):
+        """Flag on for channels that have sample above empty threshold."""
+        return self._set_peaks_from_magnitude(np.absolute(sampleblock))
+
     def flag_on(self, n):
         """Turn a channel flag on, or reset all channel flags."""
         if type(n) is int:
@@ -75,58 +481,10 @@ class SampleblockChannelInfo:
             self.flag = 0
         return self.flag
 
-    def set_correlation(self, channelblock):
-        """Check whether audio is panned mono."""
-        if self.isCorrelated is not False:
-            self.isCorrelated = self.channels < 2 or self._is_channelblock_correlated(
-                channelblock
-            )
-
-    def _is_channelblock_correlated(self, channelblock):
-        """Analyze if the sample-to-sample ratios are correlated."""
-        ratios = [self._get_ratio(samples) for samples in channelblock]
-        return self._is_ratio_correlated(ratios)
-
-    def _get_ratio(self, samples):
-        """Calculate the sample-to-sample ratio of all channels."""
-        a = np.array(samples[:-1])
-        b = np.array(samples[1:])
-        return np.nan_to_num(np.divide(b, a, dtype="float")).tolist()
-
-    def _is_ratio_correlated(self, ratios):
-        """Check if the difference of ratios are below null threshold."""
-        return (
-            np.absolute(np.diff(np.array(ratios), axis=0)).flat < self.null_threshold
-        ).all()
-
-    def set_sample(self, sampleblock):
-        """A valid sample of all channels with the same position."""
-        self.sample = self._get_sample_from_sampleblock(sampleblock)
-
     def reset_sample(self):
         """Empty a sample of all channels."""
         self.sample = []
 
-    def _get_sample_from_sampleblock(self, sampleblock):
-        """Take a sample of all channels with the same position."""
-        if self.sample:
-            sampleblock = np.append([self.sample], sampleblock, axis=0)
-        sampleblock = np.array(sampleblock)
-        return self._get_valid_sample(sampleblock[np.all(sampleblock, axis=1), :])
-
-    def _is_sample_identical(self, sample):
-        """Check whether all channels of a sample have the same value."""
-        return len(set(sample)) == 1
-
-    def _get_valid_sample(self, sampleblock):
-        """Get the sample with the highest absolute amplitude."""
-        try:
-            a = sampleblock[np.all(sampleblock != 0, axis=1), :]
-            maxindex = np.unravel_index(np.argmax(np.absolute(a)), a.shape)
-            return a[maxindex[0]].tolist()
-        except ValueError:
-            return self.sample
-
     # Noisefloor algorithm needs reconsideration for three reasons:
     # 1. Noisefloor should be above digital noisefloor value of 0 (float)
     # 2. Audio clip could contain fade in/outs that results in values lower than normal noisefloor
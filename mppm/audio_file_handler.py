@@ -1,13 +1,20 @@
+import contextlib
+import functools
 import math
 import os
 import shutil
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from soundfile import SoundFile as sf
 from soundfile import SEEK_END
 
 from .analyze import SampleblockChannelInfo
+from .probe import probe
+from .reader import HANDLE_POOL, MemoryMappedReader, open_file, read_ahead
 from .utils import lazy_property
 
 import logging
@@ -24,90 +31,199 @@ def _dB_to_float(v):
     return 10 ** (v / 20)
 
 
-class AudioFile:
-    """An Audio file.
+_NATIVE_DTYPES = {
+    "PCM_S8": "int16",
+    "PCM_U8": "int16",
+    "PCM_16": "int16",
+    "PCM_24": "int32",
+    "PCM_32": "int32",
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+}
+"""Smallest types that hold the samples of each subtype losslessly."""
+
+_FLOAT32_SUBTYPES = ("PCM_S8", "PCM_U8", "PCM_16", "PCM_24", "FLOAT")
+"""Subtypes whose samples float32 represents exactly."""
+
+
+_SAMPLE_WIDTHS = {
+    "PCM_S8": 1,
+    "PCM_U8": 1,
+    "PCM_16": 2,
+    "PCM_24": 3,
+    "PCM_32": 4,
+    "FLOAT": 4,
+    "DOUBLE": 8,
+    "ULAW": 1,
+    "ALAW": 1,
+}
+"""Bytes per sample of uncompressed subtypes."""
+
+_SMALL_FORMATS = ("WAV", "WAVEX", "AIFF")
+"""Containers whose 32 bit chunk sizes limit files to 4 GB."""
+
+_MAX_DATA_SIZE = 2 ** 32 - 2 ** 16
+"""Largest data written to a small format, leaving room for headers."""
+
+_LARGE_EXTENSIONS = {"RF64": (".wav", ".wave", ".rf64"), "W64": (".w64",)}
+"""Extensions of the large containers, the first one given to outputs."""
+
+
+def _get_scale(dtype):
+    """Full scale value of a sample type, 1 for floats."""
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return int(np.iinfo(dtype).max) + 1
+    return 1
+
+
+def _get_dtype(options, subtype):
+    """The sample type to read a file of a subtype with, see AudioFile.dtype."""
+    dtype = options.get("dtype", "float64")
+    if dtype == "native":
+        return _NATIVE_DTYPES.get(subtype, "float64")
+    if dtype == "float32" and subtype not in _FLOAT32_SUBTYPES:
+        return _NATIVE_DTYPES.get(subtype, "float32")
+    return dtype
+
+
+def _create_info(options, dtype):
+    """An empty analysis for the options of a file read as dtype."""
+    return SampleblockChannelInfo(
+        flag=None,
+        isCorrelated=None,
+        sample=None,
+        null_threshold=_dB_to_float(options.get("null_threshold", -100)),
+        empty_threshold=_dB_to_float(options.get("empty_threshold", -100)),
+        correlation=options.get("correlation", "ratio"),
+        statistics=options.get("statistics", True),
+        scale=_get_scale(dtype),
+    )
 
-    For more documentation see the __init__() docstring.
 
+_BLOCK_ARRAYS = 4
+"""Number of sampleblock sized float arrays alive during analysis."""
+
+
+def _get_blocksize(frames, channels, samplerate, budget):
+    """Largest blocksize whose analysis fits in a memory budget.
+
+    Blocks longer than a second are rounded down to whole seconds.
+
+    Parameters
+    ----------
+    frames : int
+        Total frames of the file, no block is larger than this.
+    channels : int
+        Number of channels of the file.
+    samplerate : int
+        Sample rate of the file.
+    budget : int
+        Memory budget in bytes.
+
+    Returns
+    -------
+    int
+        Number of frames per sampleblock.
     """
-    def __init__(
-        self, filepath=None, blocksize=None, analyze=True, options=None,
-    ):
-        """Open an audio file.
+    blocksize = int(budget // (max(channels, 1) * 8 * _BLOCK_ARRAYS))
+    if samplerate and blocksize > samplerate:
+        blocksize -= blocksize % samplerate
+    return max(1, min(blocksize, frames))
+
+
+_ANALYSIS_FIELDS = (
+    "_channels",
+    "_frames",
+    "_samplerate",
+    "_subtype",
+    "_validChannel",
+    "_flag",
+    "_isCorrelated",
+    "_sample",
+    "_gain",
+    "_statistics",
+    "_action",
+)
+"""Attributes holding the results of an analysis, kept by AnalysisRecord."""
+
+
+def _get_signature(filepath):
+    """Size and modification time of a file, None if it does not exist."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+"""The umask of the process, read once as changing it is not thread safe."""
+
+
+def _copy_mode(filepath, target):
+    """Give a file the mode of the file it replaces.
+
+    A file replacing no file gets the mode of a newly created file.
+    """
+    if os.path.exists(target):
+        shutil.copymode(target, filepath)
+    else:
+        os.chmod(filepath, 0o666 & ~_UMASK)
+
+
+def _parse_location(filepath, delimiter):
+    """Split a filepath into the parts used to group audio files."""
+    dirname, basename = os.path.split(filepath)
+    root, ext = os.path.splitext(filepath)
+    filename = basename[: -len(ext)]
+    try:
+        filebase, ch = filename.rsplit(delimiter, 1)
+        ch = "1" if ch == "L" else "2" if ch == "R" else ch
+        if ch.isdigit():
+            channelnum = ch
+        else:
+            raise ValueError
+    except ValueError:
+        filebase = filename
+        channelnum = ""
+    return {
+        "dirname": dirname,
+        "basename": basename,
+        "filename": filename,
+        "extension": ext,
+        "root": root,
+        "filebase": filebase,
+        "channelnum": channelnum,
+    }
 
-        Parameters
-        ----------
-        filepath: str, optional
-            The complete path to an audio file.
-        blocksize: {str, int}, optional
-            The size of sampleblock to be used for analysis.
-        analyze: bool
-            Whether to analyze the audio file, may be turned off for
-            faster debugging of file info.
-        options: dict, optional
-            Options for working with the audio file. Possible Keys:
-            delimiter: The string or character in the filename that
-                separates root with its channel info. For example a
-                filename called sin_R.wav has delimiter of underscore
-                '_', with 'sin' as root, and R as it's channel.
-            null_threshold: A decibels number to determine the maximum
-                allowed differences between two channels for them to be
-                considered different.
-            empty_threshold: A decibels number to determine the lowest
-                value before a sample is considered noise.
 
-        """
 
-        LOGGER.debug(
-            f"Initiating file: {self.__class__.__name__}, with filepath: {filepath}"
-        )
-        self._filepath = filepath
-        self._file = None
-        self._location = None
-        self.blocksize = None if str(blocksize) == "None" else int(blocksize)
-        self._channels = None
-        self._validChannel = 0
-        self._flag = None
-        self._isCorrelated = None
-        self._sample = None
-        self._samplerate = None
-        self._action = "N"
-        self._options = options or {"delimiter": "."}
-        self.join_files = []
-        if filepath is not None and analyze:
-            self.file = filepath
+def _leased(method):
+    """Keep the file of an AudioFile open while the method runs."""
 
-    def __del__(self):
-        self.close()
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.file:
+            return method(self, *args, **kwargs)
+        with self._lease():
+            return method(self, *args, **kwargs)
 
-    def __enter__(self):
-        if self._file is None and self._filepath is not None:
-            self.file = self._filepath
-        return self
+    return wrapper
 
-    def __exit__(self, *args):
-        self.close()
 
-    def __eq__(self, other):
-        return isinstance(other, AudioFile) and self._filepath == other._filepath
+class _AudioBase:
+    """Classification and location of an audio file.
 
-    @property
-    def file(self):
-        return self._file
+    Shared by AudioFile and AnalysisRecord, which keep the analysis
+    results in the same private attributes.
+    """
 
-    @file.setter
-    def file(self, file):
-        try:
-            self._file = sf(file)
-        except RuntimeError:
-            self.close()
-        else:
-            self._channels = self._file.channels
-            self._samplerate = self._file.samplerate
-            if not self.blocksize:
-                self.blocksize = self._file.frames
-            self.analyze()
-            self._file.seek(0)
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return isinstance(other, _AudioBase) and self._filepath == other._filepath
 
     @property
     def action(self):
@@ -139,39 +255,6 @@ class AudioFile:
         ):
             self._action = v
 
-    @lazy_property
-    def location(self):
-        """Information regarding the location of the audio file.
-
-        Returns
-        -------
-        dict
-            List of file location related information.
-        """
-        dirname, basename = os.path.split(self._filepath)
-        root, ext = os.path.splitext(self._filepath)
-        filename = basename[: -len(ext)]
-        try:
-            filebase, ch = filename.rsplit(self.delimiter, 1)
-            ch = "1" if ch == "L" else "2" if ch == "R" else ch
-            if ch.isdigit():
-                channelnum = ch
-            else:
-                raise ValueError
-        except ValueError:
-            filebase = filename
-            channelnum = ""
-        self._location = {
-            "dirname": dirname,
-            "basename": basename,
-            "filename": filename,
-            "extension": ext,
-            "root": root,
-            "filebase": filebase,
-            "channelnum": channelnum,
-        }
-        return self._location
-
     filepath = property(lambda self: self._filepath)
     """The absolute location of the file."""
     dirname = property(lambda self: self.location["dirname"])
@@ -202,11 +285,11 @@ class AudioFile:
 
     countValidChannel = property(lambda self: bin(self.validChannel).count("1"))
 
-    channels = property(
-        lambda self: self._file.channels if self._file else self._channels
-    )
+    backend = property(lambda self: self.options.get("backend", "soundfile"))
 
-    frames = property(lambda self: self._file.frames)
+    channels = property(lambda self: self._channels)
+
+    frames = property(lambda self: self._frames)
 
     flag = property(lambda self: self._flag)
 
@@ -214,8 +297,26 @@ class AudioFile:
 
     sample = property(lambda self: self._sample)
 
+    gain = property(lambda self: self._gain)
+    """Estimated gain of each channel relative to the first one."""
+
+    statistics = property(lambda self: self._statistics)
+    """Threshold independent results of the last analysis."""
+
     samplerate = property(lambda self: self._samplerate)
 
+    subtype = property(lambda self: self._subtype)
+
+    @property
+    def dtype(self):
+        """The sample type used to read and transform the file.
+
+        With the 'native' dtype option, PCM files are read as integers.
+        With 'float32', subtypes that float32 cannot hold exactly fall
+        back to their native type, so transforms stay bit-exact.
+        """
+        return _get_dtype(self.options, self._subtype)
+
     isEmpty = property(lambda self: self.validChannel == 0 or self.channels == 0)
     """File is pure noise or noisefloor."""
     isMono = property(lambda self: self.channels == 1 and not self.isEmpty)
@@ -243,27 +344,24 @@ class AudioFile:
     def update_options(self, options):
         self._options.update(options)
 
-    def close(self):
-        if self._file:
-            self._file.close()
-            self._file = None
-
-    def read(self, *args, **kwargs):
-        if self._file:
-            yield self._file.read(*args, **kwargs)
-            self._file.seek(0)
+    def apply_thresholds(self):
+        """Classify the file for the current thresholds without reading it.
 
-    def analyze(self):
-        """Analyze the audio file for channel information."""
-        if self.file:
-            info = self._analyze_blocks()
-            if info is not None:
-                self._flag = info.flag
-                self._isCorrelated = info.isCorrelated
-                self._sample = info.sample
-            self._validChannel = self._analyze_valid_channels(
-                self.flag, self.isCorrelated, self.sample
-            )
+        Returns
+        -------
+        bool
+            Whether complete statistics were available, otherwise the
+            file has to be analyzed again.
+        """
+        statistics = self._statistics
+        if statistics is None or not statistics.isComplete:
+            return False
+        self._flag = statistics.get_flag(self.empty_threshold)
+        self._isCorrelated = statistics.get_correlation(self.null_threshold)
+        self._validChannel = self._analyze_valid_channels(
+            self.flag, self.isCorrelated, self.sample
+        )
+        return True
 
     def _analyze_valid_channels(self, flag=0, isCorrelated=False, sample=[]):
         """Determine which channels have meaningful values."""
@@ -278,18 +376,6 @@ class AudioFile:
         else:
             return flag
 
-    def _analyze_blocks(self):
-        info = SampleblockChannelInfo(
-            flag=None,
-            isCorrelated=None,
-            sample=None,
-            null_threshold=self.null_threshold,
-            empty_threshold=self.empty_threshold,
-        )
-        for sampleblock in self.file.blocks(blocksize=self.blocksize, always_2d=True):
-            info.set_info(sampleblock)
-        return info
-
     def default_action(self, options={}):
         """Determine the default action to take.
 
@@ -301,11 +387,14 @@ class AudioFile:
         Returns
         -------
         str
-            The action code to be used for action.setter.
+            The action code to be used for action.setter, 'N' for a
+            file that could not be opened and analyzed.
         """
         m = options.get("monoize", True)
         r = options.get("remove", True)
         j = options.get("join", True)
+        if self.channels is None:
+            return "N"
         if self.isEmpty and r:
             return "R"
         if self.isFakeStereo and m:
@@ -314,27 +403,6 @@ class AudioFile:
             return "J"
         return "N"
 
-    def proceed(self, options={}):
-        """Carry out the set action of the file.
-
-        Parameters
-        ----------
-        options : dict, optional
-            keyword arguments for the selected action method.
-        """
-        if options.get("read_only", False):
-            return self.action
-
-        options = {**self.options, **options}
-        if self._action == "M":
-            return self.monoize(**options.get("monoize_options", {}))
-        if self._action == "R":
-            return self.remove(forced=True)
-        if self._action == "S":
-            return self.split(**options.get("split_options", {}))
-        if self._action == "J":
-            return self.join(**options.get("join_options", {}))
-
     def backup(self, filepath, read_only=False):
         """Make a identical copy of the file to a desinated filepath.
 
@@ -357,29 +425,569 @@ class AudioFile:
             return filepath
         except FileNotFoundError:
             path = os.path.split(filepath)[0]
-            os.makedirs(path)
+            os.makedirs(path, exist_ok=True)
             return self.backup(filepath)
 
+
+class AudioFile(_AudioBase):
+    """An Audio file.
+
+    For more documentation see the __init__() docstring.
+
+    """
+    def __init__(
+        self, filepath=None, blocksize=None, analyze=True, options=None, pool=None,
+    ):
+        """Open an audio file.
+
+        Parameters
+        ----------
+        filepath: str, optional
+            The complete path to an audio file.
+        blocksize: {str, int}, optional
+            The size of sampleblock to be used for analysis. If None,
+            the 'blocksize' option is used, and if that is None as
+            well, the largest blocksize within the memory budget.
+        analyze: bool
+            Whether to analyze the audio file, may be turned off for
+            faster debugging of file info.
+        options: dict, optional
+            Options for working with the audio file. Possible Keys:
+            delimiter: The string or character in the filename that
+                separates root with its channel info. For example a
+                filename called sin_R.wav has delimiter of underscore
+                '_', with 'sin' as root, and R as it's channel.
+            null_threshold: A decibels number to determine the maximum
+                allowed differences between two channels for them to be
+                considered different.
+            empty_threshold: A decibels number to determine the lowest
+                value before a sample is considered noise.
+            correlation: Either 'ratio' (default) to compare the
+                sample-to-sample ratios of channels, or 'gain' to test
+                channels for being scaled copies without divisions.
+            early_exit: Stop reading the file as soon as no further
+                sampleblock can change the classification.
+            analysis: Either 'full' (default) to read the whole file,
+                or 'triage' to first analyze a few windows spread over
+                the file, and only read all of it when those windows do
+                not settle the classification.
+            triage_windows: Number of windows read by triage, 16 by
+                default.
+            triage_window: Number of frames in each triage window,
+                4096 by default.
+            statistics: Keep threshold independent statistics of the
+                analysis, True by default, so that threshold changes
+                can be applied without reading the file again.
+            dtype: The sample type to read the file with for analysis
+                and transforms, 'float64' by default. 'float32' halves
+                the memory used, and 'native' reads PCM files as int16
+                or int32, so silence is detected on the raw integers.
+                Both keep the samples of PCM files bit-exact.
+            memory_budget: Megabytes of memory the analysis may use
+                for sampleblocks when no blocksize is given, 64 by
+                default.
+            read_ahead: Number of sampleblocks decoded ahead on a
+                background thread while the current one is analyzed,
+                0 (default) to read and analyze in turn. Not used for
+                views of memory mapped files.
+            backend: Either 'soundfile' (default) or 'mmap' to memory
+                map uncompressed PCM and float files, which are
+                analyzed through views of the mapping when read with
+                their stored sample type, such as with the 'native'
+                dtype. Other files fall back to soundfile.
+            segments: Number of frame ranges of long files analyzed
+                concurrently, each on its own thread and file handle,
+                1 by default. Not used with the 'gain' correlation.
+            large_format: The container written instead of WAV or AIFF
+                when a transform would produce more than 4 GB, 'RF64'
+                by default, or 'W64'.
+        pool: HandlePool, optional
+            The pool keeping the file open between uses, by default one
+            shared by all audio files.
+
+        """
+
+        LOGGER.debug(
+            f"Initiating file: {self.__class__.__name__}, with filepath: {filepath}"
+        )
+        self._pool = HANDLE_POOL if pool is None else pool
+        self._filepath = filepath
+        self._source = None
+        self._location = None
+        self._options = options or {"delimiter": "."}
+        if str(blocksize) == "None":
+            blocksize = self._options.get("blocksize")
+        self._blocksize = None if str(blocksize) == "None" else int(blocksize)
+        self.blocksize = self._blocksize
+        self._channels = None
+        self._frames = None
+        self._validChannel = 0
+        self._flag = None
+        self._isCorrelated = None
+        self._sample = None
+        self._gain = None
+        self._analyzedFrames = 0
+        self._analysisMode = None
+        self._analysisTime = None
+        self._statistics = None
+        self._samplerate = None
+        self._subtype = None
+        self._action = "N"
+        self._isRestored = False
+        self.join_files = []
+        if filepath is not None and analyze:
+            self.file = filepath
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        isClosed = self._source is None and self._filepath is not None
+        if isClosed and not self._isRestored:
+            self.file = self._filepath
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def file(self):
+        """The opened file, None if closed or no longer readable.
+
+        The handle is kept in the handle pool, which may close it to
+        bound the number of open files, and is opened again on demand.
+        """
+        if self._source is None:
+            return None
+        try:
+            return self._pool.get(id(self), self._source, self.backend)
+        except RuntimeError:
+            self._source = None
+            return None
+
+    @file.setter
+    def file(self, file):
+        self.load(file)
+
+    def _lease(self):
+        """Keep the handle open in the pool until the context ends."""
+        return self._pool.lease(id(self), self._source, self.backend)
+
+    def load(self, file, statistics=None, info=None):
+        """Open the audio file and analyze it.
+
+        Parameters
+        ----------
+        file : {str, SoundFile, MemoryMappedReader}
+            The location of the file, or an already opened file.
+        statistics : AnalysisStatistics, optional
+            Results of an analysis done elsewhere, such as a batch
+            analysis, to use instead of reading the file again.
+        info : SampleblockChannelInfo, optional
+            Analysis of all samples written to the file by a transform,
+            to use instead of reading the file again.
+        """
+        try:
+            if isinstance(file, (sf, MemoryMappedReader)):
+                handle = file
+                self._pool.put(id(self), handle)
+            else:
+                handle = self._pool.get(id(self), file, self.backend)
+        except RuntimeError:
+            self.close()
+        else:
+            self._source = handle.name
+            self._channels = handle.channels
+            self._frames = handle.frames
+            self._samplerate = handle.samplerate
+            self._subtype = handle.subtype
+            self._set_blocksize()
+            if info is not None:
+                self._set_info(info)
+                self._analysisMode = "full"
+                self._analysisTime = None
+            elif statistics is None:
+                self.analyze()
+            else:
+                self.set_statistics(statistics)
+            self.file.seek(0)
+
+    def restore(self, record):
+        """Take over an analysis kept by a record without reading the file.
+
+        The file is opened on first use. A record of a file that could
+        not be opened stays unanalyzed, the file is not opened again.
+
+        Parameters
+        ----------
+        record : AnalysisRecord
+            The record of an earlier analysis of this file.
+        """
+        self._isRestored = True
+        for name in _ANALYSIS_FIELDS:
+            setattr(self, name, getattr(record, name))
+        self.join_files = [each.materialize(self._pool) for each in record.join_files]
+        if self._channels is not None:
+            self._source = self._filepath
+            self._set_blocksize()
+
+    def restore_header(self, info, statistics):
+        """Take over a probed header and an analysis done elsewhere.
+
+        Used for files analyzed in a batch, the file is opened on first
+        use.
+
+        Parameters
+        ----------
+        info : ProbeInfo
+            The header of the file.
+        statistics : AnalysisStatistics
+            Complete statistics of the whole file.
+        """
+        self._isRestored = True
+        self._channels = info.channels
+        self._frames = info.frames
+        self._samplerate = info.samplerate
+        self._subtype = info.subtype
+        self._source = self._filepath
+        self._set_blocksize()
+        self.set_statistics(statistics)
+
+    def _set_blocksize(self):
+        self.blocksize = self._blocksize or _get_blocksize(
+            self._frames, self._channels, self._samplerate, self.memory_budget
+        )
+
+    @lazy_property
+    def location(self):
+        """Information regarding the location of the audio file.
+
+        Returns
+        -------
+        dict
+            List of file location related information.
+        """
+        self._location = _parse_location(self._filepath, self.delimiter)
+        return self._location
+
+    memory_budget = property(
+        lambda self: int(float(self.options.get("memory_budget", 64)) * 2 ** 20)
+    )
+    """Memory budget in bytes for analysis without a fixed blocksize."""
+
+    analyzedFrames = property(lambda self: self._analyzedFrames)
+    """Number of frames read during the last analysis."""
+
+    analysisMode = property(lambda self: self._analysisMode)
+    """Whether the last analysis was decided by 'triage' or a 'full' scan."""
+
+    analysisTime = property(lambda self: self._analysisTime)
+    """Seconds spent by the last analysis, None if done elsewhere."""
+
+    @property
+    def throughput(self):
+        """Frames analyzed per second by the last analysis."""
+        if not self._analysisTime:
+            return None
+        return self._analyzedFrames / self._analysisTime
+
+    @property
+    def _isMapped(self):
+        """Whether blocks can be read as views of a memory mapped file."""
+        file = self.file
+        return isinstance(file, MemoryMappedReader) and file.dtype == self.dtype
+
+    def close(self):
+        self._pool.release(id(self))
+        self._source = None
+
+    def read(self, *args, **kwargs):
+        if self.file:
+            with self._lease() as file:
+                yield file.read(*args, **kwargs)
+                file.seek(0)
+
+    @_leased
+    def analyze(self):
+        """Analyze the audio file for channel information."""
+        if self.file:
+            start = time.perf_counter()
+            self.file.seek(0)
+            info = None
+            frames = 0
+            if self.options.get("analysis", "full") == "triage":
+                info = self._analyze_windows()
+                self._analysisMode = "triage"
+            if info is None or not info.isSettled:
+                frames = 0 if info is None else info.frames
+                self.file.seek(0)
+                segments = self._get_segments()
+                if segments > 1:
+                    info = self._analyze_segments(segments)
+                else:
+                    info = self._analyze_blocks()
+                self._analysisMode = "full"
+            self._set_info(info, frames)
+            self._analysisTime = time.perf_counter() - start
+
+    def _set_info(self, info, frames=0):
+        """Take over the results of the sampleblocks analyzed by info."""
+        if info is not None:
+            self._flag = info.flag
+            self._isCorrelated = info.isCorrelated
+            self._sample = info.sample
+            self._gain = info.gain
+            self._analyzedFrames = frames + info.frames
+            self._statistics = info.get_statistics()
+            self._statistics.isComplete = (
+                info.statistics and info.frames == self.frames
+            )
+        self._validChannel = self._analyze_valid_channels(
+            self.flag, self.isCorrelated, self.sample
+        )
+
+    def set_statistics(self, statistics):
+        """Take over the results of an analysis done elsewhere.
+
+        Parameters
+        ----------
+        statistics : AnalysisStatistics
+            Complete statistics of the whole file.
+        """
+        self._statistics = statistics
+        self._sample = statistics.sample
+        self._gain = statistics.gain
+        self._analyzedFrames = statistics.frames
+        self._analysisMode = "full"
+        self._analysisTime = None
+        self.apply_thresholds()
+
+    def _create_info(self):
+        return _create_info(self.options, self.dtype)
+
+    def _analyze_windows(self):
+        """Analyze short windows spread evenly across the file.
+
+        Returns
+        -------
+        SampleblockChannelInfo
+            The analysis of all windows, or None if the windows would
+            cover the whole file anyway.
+        """
+        windows = int(self.options.get("triage_windows", 16))
+        size = int(self.options.get("triage_window", 4096))
+        if windows < 1 or windows * size >= self.frames:
+            return None
+        info = self._create_info()
+        out = None if self._isMapped else np.empty((size, self.channels), self.dtype)
+        file = self.file
+        for position in np.linspace(0, self.frames - size, windows, dtype=int):
+            file.seek(int(position))
+            window = file.read(size, self.dtype, True, out=out)
+            info.reset_carry()
+            info.set_info(window)
+        return info
+
+    def _get_segments(self):
+        """Number of frame ranges to analyze concurrently, at least one.
+
+        Each range spans at least one sampleblock. The 'gain' correlation
+        depends on the order of the sampleblocks and is never split.
+        """
+        if self.options.get("correlation", "ratio") == "gain":
+            return 1
+        segments = int(self.options.get("segments", 1))
+        return max(1, min(segments, self.frames // self.blocksize))
+
+    def _analyze_segments(self, segments):
+        """Analyze ranges of frames on threads and merge the results in order.
+
+        Every range is read through its own handle, starting from the
+        last frame before it, so the result is the same as a single pass.
+        """
+        bounds = np.linspace(0, self.frames, segments + 1, dtype=int).tolist()
+        with ThreadPoolExecutor(segments) as executor:
+            infos = list(executor.map(self._analyze_segment, bounds[:-1], bounds[1:]))
+        info = infos[0]
+        for each in infos[1:]:
+            info.merge(each)
+        return info
+
+    def _analyze_segment(self, start, stop):
+        info = self._create_info()
+        size = self.blocksize
+        if self._blocksize is None:
+            size = max(1, size // self._get_segments())
+        size = min(size, stop - start)
+        with open_file(self._source, self.backend) as file:
+            if start:
+                file.seek(start - 1)
+                info.set_carry(file.read(1, self.dtype, True))
+            if isinstance(file, MemoryMappedReader) and file.dtype == self.dtype:
+                blocks = file.blocks(
+                    size, frames=stop - start, dtype=self.dtype, always_2d=True
+                )
+            else:
+                out = np.empty((size, self.channels), self.dtype)
+                blocks = file.blocks(frames=stop - start, out=out)
+            for sampleblock in blocks:
+                info.set_info(sampleblock)
+        return info
+
+    def _iterate_blocks(self):
+        """Iterate over sampleblocks from the current position of the file.
+
+        Blocks are views of memory mapped files when possible, otherwise
+        they are read into reused buffers, so each block is only valid
+        until the next one is requested.
+        """
+        depth = int(self.options.get("read_ahead", 0))
+        size = min(self.blocksize, self.frames)
+        if self._isMapped:
+            return self.file.blocks(self.blocksize, dtype=self.dtype, always_2d=True)
+        if depth > 0 and size:
+            return read_ahead(self.file, size, self.channels, self.dtype, depth)
+        return self.file.blocks(out=np.empty((size, self.channels), self.dtype))
+
+    def _get_temporary_path(self, extension=None):
+        """Create an empty file next to this one, to be written and moved."""
+        fd, path = tempfile.mkstemp(
+            extension or self.extension,
+            "." + self.filename,
+            self.dirname or os.curdir,
+        )
+        os.close(fd)
+        return path
+
+    def _get_output_format(self, channels, frames):
+        """The container of an output, in the format of this file.
+
+        WAV and AIFF outputs whose data would pass the 4 GB limit of
+        their chunk sizes are written in the 'large_format' container
+        instead, 'RF64' by default.
+        """
+        fm = self.file.format
+        width = _SAMPLE_WIDTHS.get(self.file.subtype)
+        if fm in _SMALL_FORMATS and width:
+            if frames * channels * width > _MAX_DATA_SIZE:
+                fm = self.options.get("large_format", "RF64")
+        return fm
+
+    def _get_output_path(self, filepath, channels, frames):
+        """The location of an output, with the extension of its container.
+
+        Outputs written in a large container get its extension if they
+        have another one, such as '.wav' for an AIFF file over 4 GB.
+        """
+        extensions = _LARGE_EXTENSIONS.get(self._get_output_format(channels, frames))
+        root, ext = os.path.splitext(filepath)
+        if extensions is None or ext.lower() in extensions:
+            return filepath
+        return root + extensions[0]
+
+    def _create_output(self, filepath, channels, frames):
+        """Open a new file for writing, see _get_output_format."""
+        file = self.file
+        fm = self._get_output_format(channels, frames)
+        return sf(
+            filepath,
+            "w",
+            self._samplerate,
+            channels,
+            file.subtype,
+            file.endian,
+            fm,
+            True,
+        )
+
+    def _analyze_blocks(self):
+        info = self._create_info()
+        early_exit = self.options.get("early_exit", False)
+        blocks = self._iterate_blocks()
+        for sampleblock in blocks:
+            info.set_info(sampleblock)
+            if early_exit and info.isSettled:
+                break
+        blocks.close()
+        return info
+
+    def proceed(self, options={}):
+        """Carry out the set action of the file.
+
+        Parameters
+        ----------
+        options : dict, optional
+            keyword arguments for the selected action method.
+        """
+        if options.get("read_only", False):
+            return self.action
+
+        options = {**self.options, **options}
+        if self._action == "M":
+            return self.monoize(**options.get("monoize_options", {}))
+        if self._action == "R":
+            return self.remove(forced=True)
+        if self._action == "S":
+            return self.split(**options.get("split_options", {}))
+        if self._action == "J":
+            return self.join(**options.get("join_options", {}))
+
+    @_leased
     def monoize(self, channel=None):
         """Convert a non-mono audio file to single-channel one.
 
+        The kept channel is streamed block by block into a temporary
+        file, which then replaces the original one. The written blocks
+        are analyzed on the way, so the result is not read again. A
+        result written in a large container takes its extension, see
+        _get_output_path.
+
         Parameters
         ----------
         channel : int, optional
             The channel to keep manually. If no valid input received,
             the channel with the highest amplitude is selected, if the
             file is a fake stereo one.
+
+        Raises
+        ------
+        FileExistsError
+            If the result needs another extension, and a file with it
+            already exists.
         """
         if self.file and (channel or self.isFakeStereo):
             channel = channel or self._validChannel - 1
-            data = [x[channel] for x in self.file.read()]
-            self.file.close()
-            st = self.file.subtype
-            ed = self.file.endian
-            fm = self.file.format
-            with sf(self._filepath, "w", self._samplerate, 1, st, ed, fm, True) as f:
-                f.write(data)
-            self.file = self._filepath
+            mono = np.empty(min(self.blocksize, self.frames), self.dtype)
+            filepath = self._get_output_path(self._filepath, 1, self.frames)
+            if filepath != self._filepath and os.path.exists(filepath):
+                raise FileExistsError(filepath)
+            newfile = self._get_temporary_path(os.path.splitext(filepath)[1])
+            self.file.seek(0)
+            blocks = self._iterate_blocks()
+            info = self._create_info()
+            try:
+                with self._create_output(newfile, 1, self.frames) as f:
+                    for sampleblock in blocks:
+                        data = mono[: len(sampleblock)]
+                        np.copyto(data, sampleblock[:, channel])
+                        f.write(data)
+                        info.set_info(data[:, np.newaxis])
+            except BaseException:
+                os.remove(newfile)
+                raise
+            finally:
+                blocks.close()
+            self.close()
+            shutil.copymode(self._filepath, newfile)
+            os.replace(newfile, filepath)
+            if filepath != self._filepath:
+                os.remove(self._filepath)
+                self._filepath = filepath
+                try:
+                    del self.location
+                except AttributeError:
+                    pass
+            self.load(self._filepath, info=info)
 
     def remove(self, forced=False):
         """Remove the file from the system.
@@ -393,37 +1001,62 @@ class AudioFile:
             self.close()
             os.remove(self._filepath)
 
-    def split(self, remove=True):
+    @_leased
+    def split(self, remove=True, workers=1):
         """Split a non-single channeled file into mono files.
 
         Create a new mono audio file for each channel of the original
         one, mainly used for DAWs that distinguish between stereo audio
-        files from mono ones.
+        files from mono ones. The original is read once, block by block,
+        and each block is written to all mono files.
 
         Parameters
         ----------
         remove : bool, optional
             Remove the original file from system, default to True.
+        workers : int, optional
+            Number of threads writing to the mono files concurrently, by
+            default 1.
         """
         if self.file and self.channels > 1:
-            channelnums = ("L", "R") if self.channels == 2 else range(self.channels)
-            for i, ch in enumerate(channelnums):
-                self.file.seek(0)
-                data = self.file.read()[i]
-                st = self.file.subtype
-                ed = self.file.endian
-                fm = self.file.format
-                with sf(
-                    self.root + self.delimiter + ch + self.extension,
-                    "w",
-                    self._samplerate,
-                    1,
-                    st,
-                    ed,
-                    fm,
-                    True,
-                ) as f:
-                    f.write(data)
+            if self.channels == 2:
+                channelnums = ("L", "R")
+            else:
+                channelnums = [str(i + 1) for i in range(self.channels)]
+            newfiles = [
+                self._get_output_path(
+                    self.root + self.delimiter + ch + self.extension, 1, self.frames
+                )
+                for ch in channelnums
+            ]
+            size = min(self.blocksize, self.frames)
+            planar = np.empty((self.channels, size), self.dtype)
+            self.file.seek(0)
+            blocks = self._iterate_blocks()
+            try:
+                with contextlib.ExitStack() as stack:
+                    writers = [
+                        stack.enter_context(self._create_output(f, 1, self.frames))
+                        for f in newfiles
+                    ]
+                    executor = None
+                    if workers > 1:
+                        executor = stack.enter_context(ThreadPoolExecutor(workers))
+                    for sampleblock in blocks:
+                        data = planar[:, : len(sampleblock)]
+                        np.copyto(data, sampleblock.T)
+                        if executor is None:
+                            for f, channel in zip(writers, data):
+                                f.write(channel)
+                        else:
+                            list(executor.map(sf.write, writers, data))
+            except BaseException:
+                for newfile in newfiles:
+                    if os.path.exists(newfile):
+                        os.remove(newfile)
+                raise
+            finally:
+                blocks.close()
             if remove:
                 self.remove(forced=True)
 
@@ -433,16 +1066,19 @@ class AudioFile:
             base, delimiter, ch = s.groups()
             chs = ["L", "R"]
             chnum = chs.index(ch)
-            data = self.file.read(always_2d=True)
+            dtype = self.dtype
+            data = self.file.read(always_2d=True, dtype=dtype)
             chs.remove(ch)
             newfile = base + delimiter + chs[0] + self.extension
             if not os.path.exists(newfile):
                 return
             with AudioFile(newfile) as f:
                 if chnum:
-                    data = np.concatenate((f.file.read(always_2d=True), data), axis=1)
+                    d = f.file.read(always_2d=True, dtype=dtype)
+                    data = np.concatenate((d, data), axis=1)
                 else:
-                    data = np.concatenate((data, f.file.read(always_2d=True)), axis=1)
+                    d = f.file.read(always_2d=True, dtype=dtype)
+                    data = np.concatenate((data, d), axis=1)
                 if remove:
                     f.remove()
             st = self.file.subtype
@@ -456,12 +1092,14 @@ class AudioFile:
                 self.close()
                 os.remove(self._filepath)
 
+    @_leased
     def join(self, others=None, remove=True, forced=False, newfile=None):
         """Join several files together into a new one.
 
         Used for joining audio file of the same source but with different
         channels (multi-mic recordings) into a single multi-channeled or
-        stereo file.
+        stereo file. The files are read and written block by block, so
+        memory use does not grow with their length.
 
         Parameters
         ----------
@@ -473,7 +1111,7 @@ class AudioFile:
             default True.
         forced : bool, optional
             Whether to join files even when they have different length,
-            by default False.
+            by default False. Shorter files are padded with silence.
         newfile : str, optional
             The absolute location of the new file, if no input, use path
             + filebase of self.
@@ -497,44 +1135,148 @@ class AudioFile:
         if not isinstance(others, list):
             others = [others]
 
-        data = None
-        a = [self]
-        max_frames = self.frames
+        if not self._check_join(others, forced):
+            return
+
+        members = [self]
         for each in others:
-            if not isinstance(each, AudioFile):
-                if not os.path.exists(each):
-                    raise FileNotFoundError
-                each = AudioFile(each)
-            a.append(each)
-            max_frames = max(max_frames, each.frames)
+            if not isinstance(each, AudioFile) and not os.path.exists(each):
+                raise FileNotFoundError
+            members.append(each)
 
         newfile = self.get_newfile_path(newfile)
+        tmpfile = self._get_temporary_path()
+        try:
+            written = self._write_joined(tmpfile, members, forced)
+        except BaseException:
+            os.remove(tmpfile)
+            raise
+        if written is None:
+            os.remove(tmpfile)
+            return
+        info, channels, frames = written
+        newfile = self._get_output_path(newfile, channels, frames)
 
-        st = self.file.subtype
-        ed = self.file.endian
-        fm = self.file.format
-
-        for each in a:
-            if each.frames != self.frames and not forced:
-                return
-            d = each.file.read(always_2d=True)
-            if each.frames < max_frames and forced:
-                np.pad(d, (0, max_frames - each.frames), "constant")
-            data = d if data is None else np.concatenate((data, d), axis=1)
-
-        with sf(newfile, "w", self._samplerate, 1 + len(others), st, ed, fm, True) as f:
-            f.write(data)
+        self.close()
         if remove:
-            for each in a:
-                each.remove(forced=True)
-
+            for each in members:
+                filepath = each.filepath if isinstance(each, AudioFile) else each
+                if isinstance(each, AudioFile):
+                    each.close()
+                if os.path.abspath(filepath) != os.path.abspath(newfile):
+                    os.remove(filepath)
+        _copy_mode(tmpfile, newfile)
+        os.replace(tmpfile, newfile)
+
+        self._filepath = newfile
         try:
             del self.location
         except AttributeError:
             pass
-        self.file = newfile
+        self.load(newfile, info=info)
         return self
 
+    def _write_joined(self, newfile, members, forced=False):
+        """Interleave the members into a new file, block by block.
+
+        Every member is read into a scratch buffer of its own channel
+        count and copied into its columns of one reused output buffer,
+        shorter members are filled with zeros. Nothing is written if the
+        opened members differ in samplerate, or in length when not
+        forced.
+
+        Returns
+        -------
+        (SampleblockChannelInfo, int, int)
+            Analysis of the written blocks, None if a member has another
+            subtype, whose samples are changed by writing them, and the
+            channels and frames written. None if nothing was written.
+        """
+        with contextlib.ExitStack() as stack:
+            handles = [
+                stack.enter_context(
+                    open_file(
+                        each.filepath if isinstance(each, AudioFile) else each,
+                        self.backend,
+                    )
+                )
+                for each in members
+            ]
+            for handle in handles:
+                if handle.samplerate != self._samplerate:
+                    return None
+                if handle.frames != self._frames and not forced:
+                    return None
+            frames = max(handle.frames for handle in handles)
+            channels = sum(handle.channels for handle in handles)
+            size = self._blocksize or _get_blocksize(
+                frames, channels, self._samplerate, self.memory_budget
+            )
+            size = max(1, min(size, frames))
+            out = np.empty((size, channels), self.dtype)
+            scratch = {
+                handle.channels: np.empty((size, handle.channels), self.dtype)
+                for handle in handles
+            }
+            f = stack.enter_context(self._create_output(newfile, channels, frames))
+            info = self._create_info()
+            if any(handle.subtype != self._subtype for handle in handles):
+                info = None
+            for position in range(0, frames, size):
+                length = min(size, frames - position)
+                column = 0
+                for handle in handles:
+                    width = handle.channels
+                    data = handle.read(out=scratch[width][:length])
+                    out[: len(data), column : column + width] = data
+                    out[len(data) : length, column : column + width] = 0
+                    column += width
+                f.write(out[:length])
+                if info is not None:
+                    info.set_info(out[:length])
+        return info, channels, frames
+
+    def _check_join(self, others, forced=False):
+        """Check from the headers whether others can be joined to self.
+
+        Files whose header cannot be probed are checked after opening,
+        see _write_joined.
+
+        Parameters
+        ----------
+        others : [str, AudioFile]
+            The other files to join.
+        forced : bool, optional
+            Whether files with different length can be joined.
+
+        Returns
+        -------
+        bool
+            False if any file has a different samplerate, or a
+            different length when not forced.
+
+        Raises
+        ------
+        FileNotFoundError
+            Any file not found in others will raise this error.
+        """
+        for each in others:
+            if isinstance(each, AudioFile):
+                frames, samplerate = each.frames, each.samplerate
+            else:
+                if not os.path.exists(each):
+                    raise FileNotFoundError
+                try:
+                    info = probe(each)
+                except ValueError:
+                    continue
+                frames, samplerate = info.frames, info.samplerate
+            if samplerate != self.samplerate:
+                return False
+            if frames != self.frames and not forced:
+                return False
+        return True
+
     def get_newfile_path(self, s=None):
         join = os.path.join
         if not s:
@@ -546,4 +1288,106 @@ class AudioFile:
             if os.sep not in s:
                 return join(self.dirname, s + self.extension)
             else:
-                return s
\ No newline at end of file
+                return s
+
+
+class AnalysisRecord(_AudioBase):
+    """The analysis of an audio file, without the file.
+
+    For more documentation see the __init__() docstring.
+
+    """
+
+    __slots__ = ("_filepath", "_options", "_joinFiles", "_signature") + _ANALYSIS_FIELDS
+
+    def __init__(self, audiofile):
+        """Keep the results of an analyzed audio file.
+
+        A record holds no file handle, buffers or cached values, so a
+        folder of many thousand files can be kept in memory, and an
+        AudioFile is only created again when an action is carried out
+        or the file has to be analyzed again.
+
+        Parameters
+        ----------
+        audiofile: AudioFile
+            The analyzed file. Its options are shared, not copied.
+        """
+        self._options = audiofile._options
+        self._joinFiles = None
+        self.update(audiofile)
+
+    location = property(lambda self: _parse_location(self._filepath, self.delimiter))
+    """Information regarding the location of the audio file."""
+
+    @property
+    def join_files(self):
+        """Records of the files to join with this one."""
+        return self._joinFiles or []
+
+    @join_files.setter
+    def join_files(self, files):
+        self._joinFiles = [
+            each if isinstance(each, AnalysisRecord) else AnalysisRecord(each)
+            for each in files
+        ] or None
+
+    isCurrent = property(
+        lambda self: self._signature is not None
+        and self._signature == _get_signature(self._filepath)
+    )
+    """The file is unchanged since its analysis was recorded.
+
+    Never true for a file that could not be opened, so it is analyzed
+    again on the next update.
+    """
+
+    def update(self, audiofile):
+        """Take over the analysis results of an audio file."""
+        self._filepath = audiofile._filepath
+        for name in _ANALYSIS_FIELDS:
+            setattr(self, name, getattr(audiofile, name))
+        self.join_files = audiofile.join_files
+        self._signature = None
+        if self._channels is not None:
+            self._signature = _get_signature(self._filepath)
+
+    def materialize(self, pool=None):
+        """Create the AudioFile of the record, without analyzing it again.
+
+        Parameters
+        ----------
+        pool: HandlePool, optional
+            The pool to keep the file open in.
+
+        Returns
+        -------
+        AudioFile
+            The audio file with the analysis of the record.
+        """
+        f = AudioFile(self._filepath, analyze=False, options=self._options, pool=pool)
+        f.restore(self)
+        return f
+
+    def analyze(self, pool=None):
+        """Read and analyze the file again, for the current options."""
+        with self.materialize(pool) as f:
+            f.analyze()
+            self.update(f)
+
+    def proceed(self, options={}, pool=None):
+        """Carry out the set action of the file, see AudioFile.proceed.
+
+        The record then holds the analysis of the result, and its action
+        is reset. Records of files that could not be opened are skipped.
+        """
+        if options.get("read_only", False):
+            return self.action
+        if self._channels is None:
+            return None
+        with self.materialize(pool) as f:
+            result = f.proceed(options)
+            self.update(f)
+        self._action = "N"
+        self._joinFiles = None
+        return result
@@ -1,9 +1,22 @@
+import logging
 import os
 import shutil
-
-from .audio_file_handler import AudioFile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .analyze import analyze_batch
+from .pipeline import analyze_pipeline
+from .probe import probe
+from .audio_file_handler import AnalysisRecord, AudioFile
+from .audio_file_handler import _BLOCK_ARRAYS, _FLOAT32_SUBTYPES
+from .reader import HandlePool, open_file
+from .scheduler import Scheduler, Task, estimate_cost
 from .utils import lazy_property
 
+LOGGER = logging.getLogger(__name__)
+
 extensions = [".aiff", ".caf", ".flag", ".ogg", "raw", ".wav", ".wave"]
 """
 Potential additions supported by PySoundFile library
@@ -39,8 +52,161 @@ def _iterate_files(folder):
     return (os.path.join(folder, f) for f in _list_audio_files(folder))
 
 
-def _create_analysis(filepath, options):
-    return AudioFile(filepath, options=options)
+def _create_analysis(filepath, options, pool=None):
+    return AudioFile(filepath, options=options, pool=pool)
+
+
+def _create_record(audiofile):
+    record = AnalysisRecord(audiofile)
+    audiofile.close()
+    return record
+
+
+def _analyze_file(filepath, options):
+    """Analyze a file in a worker process, returning a picklable record."""
+    with AudioFile(filepath, options=options) as f:
+        return AnalysisRecord(f)
+
+
+def _create_parallel_analysis(filepaths, options, scheduler):
+    """Analyze files one by one on a pool of worker processes.
+
+    The longest files are started first, as the memory budget of the
+    scheduler allows.
+
+    Parameters
+    ----------
+    filepaths : [str]
+        Complete paths of the audio files.
+    options : dict
+        Options for the audio files, shared by the returned records.
+    scheduler : Scheduler
+        The scheduler admitting the files, with its maximum number of
+        worker processes.
+
+    Returns
+    -------
+    [AnalysisRecord]
+        The records of the files, in the order of filepaths.
+    """
+    if not filepaths:
+        return []
+    costs = [_estimate_file(f, options) for f in filepaths]
+    analyze = partial(_analyze_file, options=options)
+    with ProcessPoolExecutor(min(scheduler.workers, len(filepaths))) as executor:
+        records = scheduler.map(analyze, filepaths, costs, executor)
+    for record in records:
+        record._options = options
+    return records
+
+
+def _estimate_file(filepath, options):
+    """Memory and work of analyzing a file, estimated from its header."""
+    info = _probe_file(filepath)
+    if info is None:
+        return 0, 0
+    return estimate_cost(
+        info.frames, info.channels, info.samplerate, info.subtype, options
+    )
+
+
+def _estimate_record(record, options):
+    """Memory and work of carrying out the action of a record."""
+    return estimate_cost(
+        record.frames, record.channels, record.samplerate, record.subtype, options
+    )
+
+
+def _create_batch_analysis(filepaths, options, pool=None):
+    """Analyze short files together, grouped by their channel count.
+
+    Files are sized from their header, and those longer than the
+    'batch_frames' option, 48000 by default, or whose header cannot be
+    read are analyzed one by one instead. The files of a chunk are
+    opened, read and closed in turn, so a batch holds no more than one
+    file open at a time, and so are files whose length or channels
+    differ from their header once opened. With the 'float32' dtype
+    option, groups of lossless subtypes are read as float32. The
+    batched files are not opened again, their header and statistics
+    are taken over, see AudioFile.restore_header.
+
+    Parameters
+    ----------
+    filepaths : [str]
+        Complete paths of the audio files.
+    options : dict
+        Options for the audio files.
+    pool : HandlePool, optional
+        The pool keeping the audio files open.
+
+    Returns
+    -------
+    [AudioFile]
+        The analyzed files, in the order of filepaths.
+    """
+    limit = int(options.get("batch_frames", 48000))
+    float32 = options.get("dtype") == "float32"
+    budget = float(options.get("memory_budget", 64)) * 2 ** 20
+    backend = options.get("backend", "soundfile")
+    files = [None] * len(filepaths)
+    groups = {}
+    for i, filepath in enumerate(filepaths):
+        info = _probe_file(filepath)
+        if info is None or info.frames > limit:
+            files[i] = _create_analysis(filepath, options, pool)
+        else:
+            groups.setdefault(info.channels, []).append((i, info))
+
+    for channels, group in groups.items():
+        group.sort(key=lambda x: x[1].frames)
+        framecost = channels * 8 * _BLOCK_ARRAYS
+        while group:
+            size = 1
+            while size < len(group):
+                if (size + 1) * group[size][1].frames * framecost > budget:
+                    break
+                size += 1
+            chunk, group = group[:size], group[size:]
+            subtypes = {info.subtype for _, info in chunk}
+            if float32 and subtypes.issubset(_FLOAT32_SUBTYPES):
+                dtype = np.float32
+            else:
+                dtype = np.float64
+            batch = np.zeros((len(chunk), chunk[-1][1].frames, channels), dtype)
+            lengths = []
+            for k, (i, info) in enumerate(chunk):
+                try:
+                    with open_file(filepaths[i], backend) as handle:
+                        if (handle.channels, handle.frames) != (channels, info.frames):
+                            raise RuntimeError(filepaths[i])
+                        data = handle.read(out=batch[k, : info.frames])
+                        if len(data) != info.frames:
+                            raise RuntimeError(filepaths[i])
+                    lengths.append(info.frames)
+                except RuntimeError:
+                    lengths.append(None)
+            read = [k for k, length in enumerate(lengths) if length is not None]
+            results = analyze_batch(
+                batch[read] if len(read) < len(chunk) else batch,
+                [lengths[k] for k in read],
+                correlation=options.get("correlation", "ratio"),
+            )
+            results = dict(zip(read, results))
+            for k, (i, info) in enumerate(chunk):
+                if k not in results:
+                    files[i] = _create_analysis(filepaths[i], options, pool)
+                    continue
+                f = AudioFile(filepaths[i], analyze=False, options=options, pool=pool)
+                f.restore_header(info, results[k])
+                files[i] = f
+    return files
+
+
+def _probe_file(filepath):
+    try:
+        return probe(filepath)
+    except (OSError, ValueError):
+        return None
 
 
 def _list_audio_files(folder):
@@ -56,18 +222,36 @@ class FileList:
     def __init__(self, folder=None, options=None):
         """List of files to work with.
 
+        The analysis of each file is kept as an AnalysisRecord, and its
+        AudioFile is only created again to carry out its action.
+
         Parameters
         ----------
         folder : str, optional
             Absolute location to search for files.
         options : dict, optional
-            Options for file related actions.
+            Options for file related actions. Besides the options of
+            AudioFile, 'batch' analyzes short files together in one
+            vectorized call, and 'batch_frames' sets the maximum number
+            of frames for a file to be batched. 'max_open_files' bounds
+            the number of audio files kept open at once, 64 by default,
+            others are opened again when used. 'workers' analyzes
+            files on that many processes, 1 by default, when neither
+            'batch' nor 'pipeline' is set; with 'batch', the files too
+            long to be batched are analyzed one by one in this process.
+            'pipeline' decodes files on 'readers' processes, 1 by
+            default, into shared memory analyzed by 'analyzers'
+            processes, one per CPU by default. 'memory_limit' bounds
+            the megabytes of sampleblocks of the files analyzed or
+            carried out at once, unlimited by default.
         """
         self._options = options or {
             "backup": True,
             "backup_folder": "bak",
             "delimiter": ".",
         }
+        self._pool = HandlePool(int(self._options.get("max_open_files", 64)))
+        self._scheduler = Scheduler()
         self._files = []
         self._joinlists = None
         self._flat_joinlists = None
@@ -78,6 +262,7 @@ class FileList:
         return self
 
     def __exit__(self, *args):
+        self._pool.clear()
         del self
 
     def __iter__(self):
@@ -119,6 +304,9 @@ class FileList:
 
     options = property(lambda self: dict(self._options))
 
+    scheduler = property(lambda self: self._scheduler)
+    """The scheduler of the last analysis or proceed, counting its tasks."""
+
     @property
     def folderpath(self):
         return self._folderpath
@@ -133,17 +321,83 @@ class FileList:
         self._options.update(options)
 
     def update_files(self):
-        """Update the file list to remove missing files."""
+        """Update the file list to remove missing files.
+
+        Files whose size and modification time are unchanged since
+        their analysis, including the results of proceed, are not
+        analyzed again but reclassified for the current thresholds, see
+        apply_thresholds.
+        """
+        records = {f.filepath: f for f in self._files}
         try:
             del self.files
             del self.joinlists
             del self.flat_joinlists
         except AttributeError:
             pass
-        self._files = [f for f in self if f.file]
+        files = self._search_folder(self._folderpath, records)
+        self.files = self._files = [f for f in files if f.channels is not None]
+
+    def probe(self):
+        """Read the header of every audio file in the folder.
 
-    def _search_folder(self, folder):
-        return (_create_analysis(f, self._options) for f in _iterate_files(folder))
+        Lists the files without opening decoders or analyzing them.
+
+        Returns
+        -------
+        dict
+            ProbeInfo for each filepath, None for files whose header
+            cannot be read.
+        """
+        return {f: _probe_file(f) for f in _iterate_files(self._folderpath)}
+
+    def apply_thresholds(self):
+        """Classify all files for the current thresholds.
+
+        Files analyzed with complete statistics are reclassified without
+        reading audio, the others are analyzed again.
+        """
+        for f in self:
+            if not f.apply_thresholds():
+                f.analyze(self._pool)
+
+    def _search_folder(self, folder, records=None):
+        records = dict(records or {})
+        filepaths = list(_iterate_files(folder))
+        missing = [
+            f
+            for f in filepaths
+            if f not in records
+            or not records[f].isCurrent
+            or not records[f].apply_thresholds()
+        ]
+        workers = int(self._options.get("workers", 1))
+        if self._options.get("batch", False):
+            files = _create_batch_analysis(missing, self._options, self._pool)
+            analyzed = map(_create_record, files)
+        elif self._options.get("pipeline", False):
+            analyzed = analyze_pipeline(
+                missing,
+                self._options,
+                int(self._options.get("readers", 1)),
+                self._options.get("analyzers"),
+                self._pool,
+            )
+        elif workers > 1:
+            analyzed = _create_parallel_analysis(
+                missing, self._options, self._create_scheduler()
+            )
+        else:
+            files = (_create_analysis(f, self._options, self._pool) for f in missing)
+            analyzed = map(_create_record, files)
+        records.update((f.filepath, f) for f in analyzed)
+        return [records[f] for f in filepaths]
+
+    def _create_scheduler(self):
+        limit = self._options.get("memory_limit")
+        budget = None if str(limit) == "None" else int(float(limit) * 2 ** 20)
+        self._scheduler = Scheduler(int(self._options.get("workers", 1)), budget)
+        return self._scheduler
 
     def set_default_action(self):
         """Determine the default action for each file."""
@@ -157,14 +411,93 @@ class FileList:
                 f.action = f.default_action(self.options)
 
     def proceed(self):
-        """Backup, optionally, and carry out action for all files."""
-        if self.options.pop("backup", True):
-            self.backup(**self.options.pop("backup_options", {}))
-        for f in self:
-            f.proceed(options=self.options)
+        """Backup, optionally, and carry out action for all files.
+
+        The backups, actions and removals form a graph of tasks run on
+        'workers' threads, the longest first, within the 'memory_limit'
+        option. The action of a file starts once its backup is done,
+        and a join once the backups of the files it joins are done,
+        which are removed after it. A failure skips the remaining tasks
+        of its join group, or of its file, only, and is logged.
+
+        Returns
+        -------
+        [Task]
+            The failed tasks, with their error and the filepath of their
+            join group as group.
+        """
+        options = self.options
+        backup_options = dict(options.get("backup_options", {}))
+        read_only = backup_options.pop("read_only", False)
+        folderpath = None
+        if options.get("backup", True):
+            folderpath = self._get_backup_folder(**backup_options)
+        tasks = []
+        for group in self._get_action_groups():
+            tasks.extend(self._create_tasks(group, options, folderpath, read_only))
+        failed = self._create_scheduler().run(tasks)
+        for task in failed:
+            LOGGER.error(f"Failed to proceed {task.group}", exc_info=task.error)
         self.update_files()
+        return failed
+
+    def _get_action_groups(self):
+        """Group each file with the files it joins, in the order of the list."""
+        joined = {id(o) for f in self if f.action == "Join" for o in f.join_files}
+        return [
+            [f] + (f.join_files if f.action == "Join" else [])
+            for f in self
+            if id(f) not in joined
+        ]
+
+    def _create_tasks(self, group, options, folderpath, read_only):
+        """Create the backup, action and removal tasks of a join group.
+
+        Parameters
+        ----------
+        group : [AnalysisRecord]
+            The file carrying out its action, then the files it joins.
+        options : dict
+            Options for the actions.
+        folderpath : str
+            The folder to backup the files to, None to skip backups.
+        read_only : bool
+            Only return the filepaths of the backups.
+
+        Returns
+        -------
+        [Task]
+            The tasks of the group.
+        """
+        key = group[0].filepath
+        estimates = [_estimate_record(f, options) for f in group]
+        backups = []
+        if folderpath is not None:
+            backups = [
+                Task(
+                    partial(self._backup_file, f, folderpath, read_only),
+                    cost=(0, work),
+                    group=key,
+                )
+                for f, (_, work) in zip(group, estimates)
+            ]
+        action = Task(
+            partial(group[0].proceed, options, self._pool),
+            after=backups,
+            cost=tuple(map(sum, zip(*estimates))),
+            group=key,
+        )
+        removals = [
+            Task(partial(f.proceed, options, self._pool), after=[action], group=key)
+            for f in group[1:]
+        ]
+        return backups + [action] + removals
 
     def backup(self, folder="bak", newFolder=True, read_only=False):
+        folderpath = self._get_backup_folder(folder, newFolder)
+        return [self._backup_file(f, folderpath, read_only) for f in self]
+
+    def _get_backup_folder(self, folder="bak", newFolder=True):
         def join(*args, inc="", ext=""):
             return (
                 os.path.join(*args).rstrip("\\")
@@ -181,15 +514,14 @@ class FileList:
                 i += 1
             return name
 
-        def backup(file):
-            newfile = unique(folderpath, file.filename, new=False, ext=file.extension)
-            return file.backup(newfile, read_only=read_only)
-
         bakpath, bakfolder = os.path.split(folder)
         path = self.folderpath if (not bakpath or bakpath.isspace) else bakpath
-        folderpath = unique(path, bakfolder, new=newFolder)
+        return unique(path, bakfolder, new=newFolder)
 
-        return [backup(f) for f in self]
+    @staticmethod
+    def _backup_file(file, folderpath, read_only=False):
+        newfile = os.path.join(folderpath, file.filename) + file.extension
+        return file.backup(newfile, read_only=read_only)
 
     def _get_join_options(self, f):
         base = f.filebase
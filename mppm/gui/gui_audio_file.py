@@ -3,6 +3,7 @@ import string
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
+from tkinter import messagebox
 
 
 from mppm import FileList
@@ -276,6 +277,7 @@ class FolderBrowser:
         self._FileList.folderpath = self.path.get()
         self._FileList.update_options(options)
         self._FileList.update_files()
+        self._FileList.apply_thresholds()
         self._FileList.set_default_action()
 
     def actions_command(self):
@@ -386,6 +388,14 @@ class FolderBrowser:
             "backup": self.keepBackup.get(),
         }
         self._FileList.update_options(options)
-        self._FileList.proceed()
+        failed = self._FileList.proceed()
+        if failed:
+            messagebox.showerror(
+                "Proceed",
+                "Failed to proceed:\n"
+                + "\n".join(
+                    f"{os.path.basename(task.group)}: {task.error}" for task in failed
+                ),
+            )
         self.analyze_command()
         self.stage(3)
@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .audio_file_handler import AnalysisRecord, AudioFile
+from .audio_file_handler import _BLOCK_ARRAYS, _create_info, _get_dtype
+from .reader import open_file
+
+_SLOTS_PER_WORKER = 2
+"""Ring slots per process, so every process can hold one while another waits."""
+
+
+def analyze_pipeline(filepaths, options, readers=1, analyzers=None, pool=None):
+    """Analyze files with reader and analyzer processes sharing memory.
+
+    Readers decode sampleblocks into the slots of a shared memory ring
+    and pass small control messages to the analyzers, which analyze
+    views of the slots without copying or pickling the samples. Each
+    slot starts with the last frame of the previous sampleblock, so the
+    partial analyses of the blocks merge into the same result as
+    analyzing each file in one pass.
+
+    The 'gain' correlation depends on the order of the sampleblocks,
+    with it the files are analyzed one by one instead.
+
+    Parameters
+    ----------
+    filepaths : [str]
+        Complete paths of the audio files.
+    options : dict
+        Options for the audio files, see AudioFile. The ring uses the
+        'memory_budget' option.
+    readers : int, optional
+        Number of processes decoding files, by default 1.
+    analyzers : int, optional
+        Number of processes analyzing sampleblocks, by default the
+        number of CPUs.
+    pool : HandlePool, optional
+        The pool keeping the audio files open in this process.
+
+    Returns
+    -------
+    [AnalysisRecord]
+        The records of the files, in the order of filepaths.
+    """
+    if not filepaths:
+        return []
+    if options.get("correlation", "ratio") == "gain":
+        return [_create_record(f, options, pool) for f in filepaths]
+    readers = max(1, min(readers, len(filepaths)))
+    analyzers = max(1, analyzers or os.cpu_count() or 1)
+    slots = _SLOTS_PER_WORKER * (readers + analyzers)
+    budget = float(options.get("memory_budget", 64)) * 2 ** 20
+    slotsize = max(int(budget // (slots * _BLOCK_ARRAYS)), 64)
+
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    free = context.Queue()
+    blocks = context.Queue()
+    results = context.Queue()
+    ring = shared_memory.SharedMemory(create=True, size=slots * slotsize)
+    ring_args = (ring.name, slotsize)
+    reader_args = (ring_args, options, tasks, free, blocks, results)
+    analyzer_args = (ring_args, options, free, blocks, results)
+    processes = [
+        context.Process(target=_read, args=reader_args) for _ in range(readers)
+    ] + [
+        context.Process(target=_analyze, args=analyzer_args)
+        for _ in range(analyzers)
+    ]
+    try:
+        for slot in range(slots):
+            free.put(slot)
+        for task in enumerate(filepaths):
+            tasks.put(task)
+        for _ in range(readers):
+            tasks.put(None)
+        for process in processes:
+            process.start()
+        infos = _collect(len(filepaths), results)
+    except BaseException:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for _ in range(analyzers):
+            blocks.put(None)
+        for process in processes:
+            if process.pid is not None:
+                process.join()
+        ring.close()
+        ring.unlink()
+
+    records = []
+    for filepath, info in zip(filepaths, infos):
+        if info is None:
+            records.append(_create_record(filepath, options, pool))
+        else:
+            f = AudioFile(filepath, analyze=False, options=options, pool=pool)
+            f.load(filepath, info=info)
+            records.append(AnalysisRecord(f))
+            f.close()
+    return records
+
+
+def _create_record(filepath, options, pool):
+    f = AudioFile(filepath, options=options, pool=pool)
+    record = AnalysisRecord(f)
+    f.close()
+    return record
+
+
+def _collect(files, results):
+    """Merge the partial analyses of each file in the order of its blocks.
+
+    Returns
+    -------
+    [SampleblockChannelInfo]
+        The analysis of each file, None for files the readers could not
+        open or fit in a slot.
+    """
+    partials = [{} for _ in range(files)]
+    counts = {}
+    done = 0
+    while done < files:
+        message = results.get()
+        if isinstance(message, Exception):
+            raise message
+        kind, index, value = message
+        if kind == "block":
+            partials[index][value[0]] = value[1]
+        else:
+            counts[index] = value
+        if index in counts and (
+            counts[index] is None or len(partials[index]) == counts[index][0]
+        ):
+            done += 1
+    infos = []
+    for index, partial in enumerate(partials):
+        if counts[index] is None:
+            infos.append(None)
+            continue
+        count, info = counts[index]
+        for block in range(count):
+            info.merge(partial[block])
+        infos.append(info)
+    return infos
+
+
+def _get_slot(ring, slotsize, slot, frames, channels, dtype):
+    """View of frames x channels samples in a slot of the ring."""
+    return np.ndarray((frames, channels), dtype, ring.buf, slot * slotsize)
+
+
+def _read(ring_args, options, tasks, free, blocks, results):
+    """Decode the files of tasks into the ring, one sampleblock per slot."""
+    name, slotsize = ring_args
+    ring = shared_memory.SharedMemory(name)
+    try:
+        while (task := tasks.get()) is not None:
+            index, filepath = task
+            try:
+                file = open_file(filepath, options.get("backend", "soundfile"))
+            except RuntimeError:
+                results.put(("file", index, None))
+                continue
+            with file:
+                dtype = np.dtype(_get_dtype(options, file.subtype))
+                if 2 * file.channels * dtype.itemsize > slotsize:
+                    results.put(("file", index, None))
+                    continue
+                count = _read_file(ring, slotsize, index, file, dtype, free, blocks)
+            results.put(("file", index, (count, _create_info(options, dtype))))
+    except Exception as e:
+        results.put(e)
+    finally:
+        ring.close()
+
+
+def _read_file(ring, slotsize, index, file, dtype, free, blocks):
+    """Pass the sampleblocks of a file to the analyzers.
+
+    Returns
+    -------
+    int
+        Number of sampleblocks passed.
+    """
+    size = slotsize // (file.channels * dtype.itemsize) - 1
+    carry = None
+    count = 0
+    while True:
+        slot = free.get()
+        view = _get_slot(ring, slotsize, slot, size + 1, file.channels, dtype)
+        frames = len(file.read(out=view[1:]))
+        if not frames:
+            del view
+            free.put(slot)
+            break
+        hasCarry = carry is not None
+        if hasCarry:
+            view[0] = carry
+        carry = view[frames].copy()
+        del view
+        blocks.put((index, count, slot, frames, file.channels, dtype.str, hasCarry))
+        count += 1
+        if frames < size:
+            break
+    return count
+
+
+def _analyze(ring_args, options, free, blocks, results):
+    """Analyze the sampleblocks in the ring and return the slots."""
+    name, slotsize = ring_args
+    ring = shared_memory.SharedMemory(name)
+    try:
+        while (message := blocks.get()) is not None:
+            index, block, slot, frames, channels, dtype, hasCarry = message
+            view = _get_slot(ring, slotsize, slot, frames + 1, channels, dtype)
+            info = _create_info(options, dtype)
+            if hasCarry:
+                info.set_carry(view[:1])
+            info.set_info(view[1:])
+            del view
+            free.put(slot)
+            results.put(("block", index, (block, info)))
+    except Exception as e:
+        results.put(e)
+    finally:
+        ring.close()
@@ -0,0 +1,341 @@
+import os
+import struct
+
+_HEADER_SIZE = 4096
+"""Bytes read at once, enough for the headers of most files."""
+
+_W64_GUID = bytes.fromhex("f3acd3118cd100c04f8edb8a")
+"""Tail shared by the GUIDs of the Wave64 chunks."""
+
+_W64_RIFF = b"riff" + bytes.fromhex("2e91cf11a5d628db04c10000")
+
+_WAV_FORMAT_PCM = 1
+_WAV_FORMAT_FLOAT = 3
+_WAV_FORMAT_ALAW = 6
+_WAV_FORMAT_ULAW = 7
+_WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+_WAV_SUBTYPES = {
+    (_WAV_FORMAT_PCM, 8): "PCM_U8",
+    (_WAV_FORMAT_PCM, 16): "PCM_16",
+    (_WAV_FORMAT_PCM, 24): "PCM_24",
+    (_WAV_FORMAT_PCM, 32): "PCM_32",
+    (_WAV_FORMAT_FLOAT, 32): "FLOAT",
+    (_WAV_FORMAT_FLOAT, 64): "DOUBLE",
+    (_WAV_FORMAT_ALAW, 8): "ALAW",
+    (_WAV_FORMAT_ULAW, 8): "ULAW",
+}
+
+_WAV_CODECS = {2: "MS_ADPCM", 0x11: "IMA_ADPCM", 0x31: "GSM610"}
+"""Compressed subtypes, whose frames are counted by the 'fact' chunk."""
+
+_PCM_SUBTYPES = {8: "PCM_S8", 16: "PCM_16", 24: "PCM_24", 32: "PCM_32"}
+
+_AIFC_SUBTYPES = {
+    b"NONE": ("PCM", "BIG"),
+    b"twos": ("PCM", "BIG"),
+    b"sowt": ("PCM", "LITTLE"),
+    b"raw ": ("PCM_U8", "BIG"),
+    b"in24": ("PCM_24", "BIG"),
+    b"42n1": ("PCM_24", "LITTLE"),
+    b"in32": ("PCM_32", "BIG"),
+    b"23ni": ("PCM_32", "LITTLE"),
+    b"fl32": ("FLOAT", "BIG"),
+    b"FL32": ("FLOAT", "BIG"),
+    b"fl64": ("DOUBLE", "BIG"),
+    b"FL64": ("DOUBLE", "BIG"),
+    b"alaw": ("ALAW", "BIG"),
+    b"ulaw": ("ULAW", "BIG"),
+}
+"""Subtype and byte order of AIFC compression types."""
+
+_ALAC_SUBTYPES = {1: "ALAC_16", 2: "ALAC_20", 3: "ALAC_24", 4: "ALAC_32"}
+
+
+class ProbeInfo:
+    def __init__(
+        self,
+        name,
+        format,
+        subtype,
+        endian,
+        channels,
+        samplerate,
+        frames,
+        offset,
+        blockalign=None,
+    ):
+        """Properties of an audio file read from its header.
+
+        Parameters
+        ----------
+        name : str
+            The location of the file.
+        format : str
+            The container, named as in soundfile, such as 'WAV', 'RF64',
+            'W64', 'AIFF' or 'CAF'.
+        subtype : str
+            The sample format, named as in soundfile, None if unknown.
+        endian : str
+            Byte order of the samples, either 'LITTLE' or 'BIG'.
+        channels : int
+            Number of channels.
+        samplerate : int
+            Frames per second.
+        frames : int
+            Number of frames.
+        offset : int
+            Position of the first sample in the file.
+        blockalign : int, optional
+            Bytes per frame, None for compressed subtypes.
+        """
+        self.name = name
+        self.format = format
+        self.subtype = subtype
+        self.endian = endian
+        self.channels = channels
+        self.samplerate = samplerate
+        self.frames = frames
+        self.offset = offset
+        self.blockalign = blockalign
+
+    duration = property(lambda self: self.frames / self.samplerate)
+    """Length of the file in seconds."""
+
+
+class _Header:
+    """Bytes of a file, served from one read of its beginning."""
+
+    def __init__(self, f):
+        self._f = f
+        self.size = os.fstat(f.fileno()).st_size
+        self._head = f.read(_HEADER_SIZE)
+
+    def read(self, offset, size):
+        if offset + size <= len(self._head):
+            return self._head[offset : offset + size]
+        self._f.seek(offset)
+        return self._f.read(size)
+
+    def unpack(self, fmt, offset):
+        data = self.read(offset, struct.calcsize(fmt))
+        if len(data) < struct.calcsize(fmt):
+            raise ValueError("Truncated header")
+        return struct.unpack(fmt, data)
+
+
+def probe(filepath):
+    """Read the properties of an audio file from its header only.
+
+    Supports RIFF and RIFX (WAV and WAVEX), RF64, W64, AIFF, AIFC and
+    CAF files.
+    Usually a single read of the start of the file is needed, no
+    samples are decoded.
+
+    Parameters
+    ----------
+    filepath : str
+        The location of the file.
+
+    Returns
+    -------
+    ProbeInfo
+        The properties of the file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not in a supported container or its header is
+        invalid.
+    """
+    with open(filepath, "rb") as f:
+        header = _Header(f)
+        magic = header.read(0, 16)
+        isWAV = magic[:4] in (b"RIFF", b"RIFX", b"RF64")
+        if isWAV and header.read(8, 4) == b"WAVE":
+            return _probe_wav(filepath, header, magic[:4])
+        if magic == _W64_RIFF and header.read(24, 4) == b"wave":
+            return _probe_w64(filepath, header)
+        if magic[:4] == b"FORM" and header.read(8, 4) in (b"AIFF", b"AIFC"):
+            return _probe_aiff(filepath, header)
+        if magic[:4] == b"caff":
+            return _probe_caf(filepath, header)
+    raise ValueError("Not a WAV, RF64, W64, AIFF or CAF file")
+
+
+def _iterate_chunks(header, position, fmt, align, inclusive=False):
+    """Iterate over the (id, offset, size) of the chunks of a file.
+
+    With inclusive, the size stored in the file counts the chunk header,
+    the yielded size never does.
+    """
+    length = struct.calcsize(fmt)
+    while position + length <= header.size:
+        chunk, size = header.unpack(fmt, position)
+        if inclusive:
+            if size < length:
+                return
+            size -= length
+        yield chunk, position + length, size
+        position += length + size
+        position += -position % align
+
+
+def _probe_wav(filepath, header, magic):
+    isRF64 = magic == b"RF64"
+    endian = ">" if magic == b"RIFX" else "<"
+    fmt = datasize = fact = None
+    for chunk, offset, size in _iterate_chunks(header, 12, endian + "4sI", 2):
+        if chunk == b"ds64":
+            datasize, fact = header.unpack("<QQ", offset + 8)
+        elif chunk == b"fact" and fact is None:
+            fact = header.unpack(endian + "I", offset)[0]
+        elif chunk == b"fmt ":
+            fmt = header.read(offset, size)
+        elif chunk == b"data":
+            if not isRF64 or datasize is None:
+                datasize = size
+            break
+    else:
+        raise ValueError("Missing 'data' chunk")
+    container = "RF64" if isRF64 else "WAV"
+    return _get_wav_info(
+        filepath, header, container, fmt, fact, offset, datasize, endian
+    )
+
+
+def _probe_w64(filepath, header):
+    fmt = None
+    fact = None
+    for guid, offset, size in _iterate_chunks(header, 40, "<16sQ", 8, True):
+        if guid[4:] != _W64_GUID:
+            break
+        if guid[:4] == b"fmt ":
+            fmt = header.read(offset, size)
+        elif guid[:4] == b"fact":
+            fact = header.unpack("<Q", offset)[0]
+        elif guid[:4] == b"data":
+            return _get_wav_info(filepath, header, "W64", fmt, fact, offset, size)
+    raise ValueError("Missing 'data' chunk")
+
+
+def _get_wav_info(
+    filepath, header, container, fmt, fact, offset, datasize, endian="<"
+):
+    if fmt is None or len(fmt) < 16:
+        raise ValueError("Missing or invalid 'fmt ' chunk")
+    fields = struct.unpack(endian + "HHIIHH", fmt[:16])
+    tag, channels, samplerate, _, blockalign, bits = fields
+    extension = fmt[24:26]
+    if tag == _WAV_FORMAT_EXTENSIBLE and len(extension) == 2:
+        tag = struct.unpack(endian + "H", extension)[0]
+        container = "WAVEX" if container == "WAV" else container
+    if not channels or not blockalign:
+        raise ValueError("Invalid 'fmt ' chunk")
+    datasize = min(datasize, header.size - offset)
+    subtype = _WAV_SUBTYPES.get((tag, bits))
+    if subtype is None:
+        subtype = _WAV_CODECS.get(tag)
+        frames = fact or 0
+        blockalign = None
+    else:
+        frames = datasize // blockalign
+    return ProbeInfo(
+        filepath,
+        container,
+        subtype,
+        "BIG" if endian == ">" else "LITTLE",
+        channels,
+        samplerate,
+        frames,
+        offset,
+        blockalign,
+    )
+
+
+def _get_extended(data):
+    """Convert an 80 bit IEEE 754 extended float to a number."""
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1 if exponent & 0x8000 else 1
+    return sign * mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+
+
+def _probe_aiff(filepath, header):
+    isAIFC = header.read(8, 4) == b"AIFC"
+    comm = ssnd = None
+    for chunk, offset, size in _iterate_chunks(header, 12, ">4sI", 2):
+        if chunk == b"COMM":
+            comm = header.read(offset, size)
+        elif chunk == b"SSND":
+            ssnd = offset
+        if comm is not None and ssnd is not None:
+            break
+    else:
+        raise ValueError("Missing 'COMM' or 'SSND' chunk")
+    channels, frames, bits = struct.unpack(">HIH", comm[:8])
+    samplerate = _get_extended(comm[8:18])
+    compression = comm[18:22] if isAIFC else b"NONE"
+    subtype, endian = _AIFC_SUBTYPES.get(compression, (None, "BIG"))
+    if subtype == "PCM":
+        subtype = _PCM_SUBTYPES.get(bits)
+    blockalign = channels * bits // 8 if subtype else None
+    ssnd += 8 + header.unpack(">I", ssnd)[0]
+    return ProbeInfo(
+        filepath,
+        "AIFF",
+        subtype,
+        endian,
+        channels,
+        int(samplerate),
+        frames,
+        ssnd,
+        blockalign,
+    )
+
+
+def _probe_caf(filepath, header):
+    desc = packets = None
+    for chunk, offset, size in _iterate_chunks(header, 8, ">4sq", 1):
+        if chunk == b"desc":
+            desc = header.unpack(">d4sIIIII", offset)
+        elif chunk == b"pakt":
+            packets = header.unpack(">qq", offset)
+        elif chunk == b"data":
+            if size < 0:
+                size = header.size - offset
+            break
+    else:
+        raise ValueError("Missing 'data' chunk")
+    if desc is None:
+        raise ValueError("Missing 'desc' chunk")
+    samplerate, fmt, flags, packetsize, packetframes, channels, bits = desc
+    offset += 4
+    size -= 4
+    endian = "LITTLE" if flags & 2 else "BIG"
+    if fmt == b"lpcm":
+        if flags & 1:
+            subtype = {32: "FLOAT", 64: "DOUBLE"}.get(bits)
+        else:
+            subtype = _PCM_SUBTYPES.get(bits)
+    elif fmt == b"alac":
+        subtype = _ALAC_SUBTYPES.get(flags)
+    else:
+        subtype = {b"alaw": "ALAW", b"ulaw": "ULAW"}.get(fmt)
+    if packets is not None:
+        frames = packets[1]
+    elif packetsize and packetframes:
+        frames = size // packetsize * packetframes
+    else:
+        raise ValueError("Missing 'pakt' chunk")
+    blockalign = packetsize if packetsize and packetframes == 1 else None
+    return ProbeInfo(
+        filepath,
+        "CAF",
+        subtype,
+        endian,
+        channels,
+        int(samplerate),
+        frames,
+        offset,
+        blockalign,
+    )
@@ -0,0 +1,414 @@
+import contextlib
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from soundfile import SoundFile as sf
+
+from .probe import probe
+
+_STORED_TYPES = {
+    "PCM_U8": "u1",
+    "PCM_S8": "i1",
+    "PCM_16": "i2",
+    "PCM_24": "u1",
+    "PCM_32": "i4",
+    "FLOAT": "f4",
+    "DOUBLE": "f8",
+}
+"""Sample type stored in the file for each uncompressed subtype."""
+
+
+def open_file(file, backend="soundfile"):
+    """Open an audio file for reading.
+
+    Parameters
+    ----------
+    file : str
+        The location of the file.
+    backend : {'soundfile', 'mmap'}, optional
+        'mmap' memory maps uncompressed files in the containers known
+        to probe, other files are opened with soundfile.
+
+    Returns
+    -------
+    {SoundFile, MemoryMappedReader}
+        The opened file.
+    """
+    if backend == "mmap":
+        try:
+            return MemoryMappedReader(file)
+        except (OSError, ValueError):
+            pass
+    return sf(file)
+
+
+class HandlePool:
+    def __init__(self, maxsize=64):
+        """Opened files shared by many owners, closed least recently used.
+
+        Owners get their handle back by key, and the handle is opened
+        again on demand after it was closed to stay within maxsize.
+        Handles leased for the duration of a read are never closed to
+        make room, so the pool may hold more than maxsize handles while
+        they are in use.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of files kept open, by default 64.
+        """
+        self.maxsize = maxsize
+        self._handles = OrderedDict()
+        self._leases = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __contains__(self, key):
+        return key in self._handles
+
+    def get(self, key, file, backend="soundfile"):
+        """Get the handle of an owner, opening the file if needed.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies the owner of the handle.
+        file : str
+            The location of the file.
+        backend : str, optional
+            The backend to open the file with, see open_file.
+
+        Returns
+        -------
+        {SoundFile, MemoryMappedReader}
+            The opened file.
+        """
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None or handle.closed or handle.name != file:
+                handle = open_file(file, backend)
+            self.put(key, handle)
+            return handle
+
+    @contextlib.contextmanager
+    def lease(self, key, file, backend="soundfile"):
+        """Get the handle of an owner, kept open until the context ends.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies the owner of the handle.
+        file : str
+            The location of the file.
+        backend : str, optional
+            The backend to open the file with, see open_file.
+
+        Yields
+        ------
+        {SoundFile, MemoryMappedReader}
+            The opened file.
+        """
+        with self._lock:
+            handle = self.get(key, file, backend)
+            self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                self._evict()
+
+    def put(self, key, handle):
+        """Add an opened file, closing the least recently used ones."""
+        with self._lock:
+            previous = self._handles.pop(key, None)
+            if previous is not None and previous is not handle:
+                previous.close()
+            self._handles[key] = handle
+            self._evict(key)
+
+    def _evict(self, keep=None):
+        """Close the least recently used handles that are not leased."""
+        excess = len(self._handles) - max(self.maxsize, 1)
+        if excess > 0:
+            keys = [k for k in self._handles if k != keep and k not in self._leases]
+            for k in keys[:excess]:
+                self._handles.pop(k).close()
+
+    def release(self, key):
+        """Close the handle of an owner."""
+        with self._lock:
+            handle = self._handles.pop(key, None)
+            if handle is not None:
+                handle.close()
+
+    def clear(self):
+        """Close all handles."""
+        with self._lock:
+            while self._handles:
+                self._handles.popitem()[1].close()
+
+
+HANDLE_POOL = HandlePool()
+"""Pool used by audio files that are not given one."""
+
+
+def read_ahead(file, blocksize, channels, dtype="float64", depth=2):
+    """Iterate over blocks of a file decoded on a background thread.
+
+    While a block is processed, up to depth following blocks are read
+    into a ring of depth + 2 reused buffers, so reading and processing
+    overlap. Reading starts at the current position of the file.
+
+    Parameters
+    ----------
+    file : {SoundFile, MemoryMappedReader}
+        The opened file, not to be used elsewhere until the iteration
+        is finished or closed.
+    blocksize : int
+        Number of frames in each block.
+    channels : int
+        Number of channels of the file.
+    dtype : str, optional
+        The sample type to read the file with.
+    depth : int, optional
+        Maximum number of blocks read ahead, by default 2.
+
+    Yields
+    ------
+    numpy.ndarray
+        Blocks of frames x channels, only valid until the next one is
+        requested.
+    """
+    buffers = [np.empty((blocksize, channels), dtype) for _ in range(depth + 2)]
+    blocks = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            i = 0
+            while True:
+                block = file.read(out=buffers[i % len(buffers)])
+                if len(block) and not put(block):
+                    return
+                if len(block) < blocksize:
+                    break
+                i += 1
+        except Exception as e:
+            put(e)
+        else:
+            put(None)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while (block := blocks.get()) is not None:
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        stop.set()
+        thread.join()
+
+
+class MemoryMappedReader:
+    def __init__(self, file):
+        """Read uncompressed audio files through a memory map.
+
+        Exposes the reading part of the SoundFile interface for PCM and
+        float files in WAV, RF64, W64, AIFF and CAF containers. Blocks
+        read in the stored sample type are views of the mapped data
+        instead of copies, and other sample types are converted the same
+        way soundfile does. Float samples are not read as integers, as
+        their scaling depends on the settings of soundfile.
+
+        Parameters
+        ----------
+        file : str
+            The location of the file.
+
+        Raises
+        ------
+        ValueError
+            If the file is not an uncompressed PCM or float file in one
+            of the supported containers.
+        """
+        info = probe(file)
+        try:
+            stored = _STORED_TYPES[info.subtype]
+        except KeyError:
+            raise ValueError("Unsupported sample format")
+        width = 3 if info.subtype == "PCM_24" else np.dtype(stored).itemsize
+        if info.blockalign != info.channels * width:
+            raise ValueError("Invalid block alignment")
+        self._bits = 8 * width
+
+        self.name = file
+        self.format = info.format
+        self.subtype = info.subtype
+        self.endian = "FILE"
+        self.mode = "r"
+        self.channels = info.channels
+        self.samplerate = info.samplerate
+        self.frames = info.frames
+        self._isBigEndian = info.endian == "BIG"
+        self._position = 0
+        stored = (">" if self._isBigEndian else "<") + stored
+        shape = (self.frames, self.channels) + ((3,) if self._bits == 24 else ())
+        if self.frames:
+            self._data = np.memmap(file, stored, "r", info.offset, shape)
+        else:
+            self._data = np.empty(shape, stored)
+
+    closed = property(lambda self: self._data is None)
+
+    dtype = property(lambda self: None if self._bits == 24 else self._data.dtype)
+    """The sample type read as views of the mapped data, None for 24 bit."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.frames
+
+    def __bool__(self):
+        return True
+
+    def close(self):
+        """Release the memory map.
+
+        Views handed out earlier keep the mapping alive until they are
+        released themselves.
+        """
+        self._data = None
+
+    def seek(self, frames, whence=os.SEEK_SET):
+        """Set the read position, relative to whence, like SoundFile.seek."""
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self.frames}
+        position = base[whence] + frames
+        if not 0 <= position <= self.frames:
+            raise ValueError("Invalid seek position")
+        self._position = position
+        return position
+
+    def tell(self):
+        return self._position
+
+    def read(
+        self, frames=-1, dtype="float64", always_2d=False, fill_value=None, out=None
+    ):
+        """Read frames from the current position, like SoundFile.read.
+
+        Returns
+        -------
+        numpy.ndarray
+            A read-only view of the mapped data if dtype is the stored
+            sample type, a new array otherwise. If out is given, the
+            frames are converted to its type and written into it, and
+            the filled part is returned. With fill_value, missing frames
+            are filled with it instead.
+
+        Raises
+        ------
+        TypeError
+            If float samples are read as integers.
+        """
+        if out is not None:
+            frames = len(out)
+            dtype = out.dtype
+        remaining = self.frames - self._position
+        requested = remaining if frames < 0 else frames
+        frames = min(requested, remaining)
+        start = self._position
+        data = self._convert(self._data[start : start + frames], dtype)
+        self._position += frames
+        if fill_value is not None and frames < requested:
+            filled = np.full((requested, self.channels), fill_value, data.dtype)
+            filled[:frames] = data
+            data, frames = filled, requested
+        if out is not None:
+            if out.ndim == 1:
+                data = data[:, 0]
+            out[:frames] = data
+            return out[:frames]
+        if not always_2d and self.channels == 1:
+            return data[:, 0]
+        return data
+
+    def blocks(
+        self,
+        blocksize=None,
+        overlap=0,
+        frames=-1,
+        dtype="float64",
+        always_2d=False,
+        out=None,
+    ):
+        """Iterate over blocks of frames, like SoundFile.blocks.
+
+        Without out, blocks in the stored sample type are read-only views
+        of the mapped data. Padding the last block is not supported.
+        """
+        if out is not None:
+            if blocksize is not None:
+                raise TypeError("Only one of {blocksize, out} may be specified")
+            blocksize = len(out)
+        elif blocksize is None:
+            raise TypeError("One of {blocksize, out} must be specified")
+        if overlap and overlap >= blocksize:
+            raise ValueError("overlap must be smaller than blocksize")
+        remaining = self.frames - self._position
+        end = self._position + (remaining if frames < 0 else min(frames, remaining))
+        while self._position < end:
+            size = min(blocksize, end - self._position)
+            if out is None:
+                block = self.read(size, dtype, always_2d)
+            else:
+                block = self.read(out=out[:size])
+            if self._position < end:
+                self._position -= overlap
+            yield block
+
+    def _convert(self, data, dtype):
+        """Convert stored samples to dtype with the scaling of soundfile."""
+        dtype = np.dtype(dtype)
+        if data.dtype == dtype and self._bits != 24:
+            return data
+        data = np.asarray(data)
+        if np.issubdtype(data.dtype, np.floating):
+            if np.issubdtype(dtype, np.floating):
+                return data.astype(dtype)
+            raise TypeError("Float samples are only read as integers by soundfile")
+        data = self._align(data)
+        if np.issubdtype(dtype, np.floating):
+            return data.astype(dtype) / dtype.type(2 ** 31)
+        return (data >> (32 - 8 * dtype.itemsize)).astype(dtype)
+
+    def _align(self, data):
+        """Convert stored PCM samples to left aligned int32."""
+        if self._bits == 24:
+            out = np.zeros(data.shape[:2] + (4,), np.uint8)
+            out[..., 1:] = data[..., ::-1] if self._isBigEndian else data
+            return out.view("<i4")[..., 0]
+        if self.subtype == "PCM_U8":
+            return (data.astype(np.int32) - 128) << 24
+        return data.astype(np.int32) << (32 - self._bits)
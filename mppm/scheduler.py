@@ -0,0 +1,236 @@
+import contextlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+
+from .audio_file_handler import _BLOCK_ARRAYS, _get_blocksize, _get_dtype
+
+
+def estimate_cost(frames, channels, samplerate, subtype, options):
+    """Estimate the memory and work of analyzing or transforming a file.
+
+    Parameters
+    ----------
+    frames : int
+        Number of frames of the file.
+    channels : int
+        Number of channels of the file.
+    samplerate : int
+        Sample rate of the file.
+    subtype : str
+        Subtype of the file, which decides the sample type read.
+    options : dict
+        Options of the file, for the blocksize and dtype in use.
+
+    Returns
+    -------
+    (int, int)
+        Bytes of the sampleblocks in use at once, and the number of
+        samples to process.
+    """
+    if not frames or not channels:
+        return 0, 0
+    width = np.dtype(_get_dtype(options, subtype)).itemsize
+    blocksize = options.get("blocksize")
+    if str(blocksize) == "None":
+        budget = int(float(options.get("memory_budget", 64)) * 2 ** 20)
+        blocksize = _get_blocksize(frames, channels, samplerate, budget)
+    blocksize = min(int(blocksize), frames)
+    return blocksize * channels * width * _BLOCK_ARRAYS, frames * channels
+
+
+class Task:
+    def __init__(self, func, after=(), cost=(0, 0), group=None):
+        """A unit of work in a graph of tasks run by a Scheduler.
+
+        Parameters
+        ----------
+        func : callable
+            The work, called without arguments.
+        after : [Task], optional
+            The tasks that must be done before this one starts.
+        cost : (int, int), optional
+            Memory in bytes and work of the task, see estimate_cost.
+        group : hashable, optional
+            Tasks of the same group are skipped once one of them fails.
+            Tasks depending on a failed or skipped task are skipped in
+            any case.
+        """
+        self.func = func
+        self.after = list(after)
+        self.cost = cost
+        self.group = group
+        self.state = "queued"
+        self.result = None
+        self.error = None
+
+    isReady = property(lambda self: all(t.state == "done" for t in self.after))
+    """All the tasks this one comes after are done."""
+
+    isBlocked = property(
+        lambda self: any(t.state in ("failed", "skipped") for t in self.after)
+    )
+    """A task this one comes after failed or was skipped."""
+
+
+class Scheduler:
+    def __init__(self, workers=1, budget=None):
+        """Run tasks concurrently, longest first, within a memory budget.
+
+        Tasks are started in the order of their estimated work, largest
+        first, so that long tasks do not end up as a tail after the
+        short ones. A task only starts while the memory of the running
+        tasks and its own fits in the budget; the largest waiting task
+        that fits is started first, and a task larger than the budget
+        runs alone.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Maximum number of tasks running at once, by default 1.
+        budget : int, optional
+            Bytes of memory the running tasks may use together,
+            unlimited if None.
+        """
+        self.workers = max(1, int(workers))
+        self.budget = budget
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+
+    queued = property(lambda self: self._queued)
+    """Number of tasks waiting to start."""
+    running = property(lambda self: self._running)
+    """Number of tasks started and not finished."""
+    completed = property(lambda self: self._completed)
+    """Number of tasks finished, failed or skipped."""
+
+    def map(self, func, items, costs, executor=None):
+        """Apply a function to every item as scheduled.
+
+        Parameters
+        ----------
+        func : callable
+            The task, called with one item.
+        items : iterable
+            The arguments of the tasks.
+        costs : [(int, int)]
+            Memory in bytes and work of each item, see estimate_cost.
+        executor : Executor, optional
+            The executor running the tasks, by default a thread pool
+            of workers threads.
+
+        Returns
+        -------
+        list
+            The results, in the order of items.
+
+        Raises
+        ------
+        Exception
+            The first exception raised by a task, in the order of
+            items, once all tasks have finished.
+        """
+        tasks = [
+            Task(partial(func, item), cost=cost) for item, cost in zip(items, costs)
+        ]
+        failed = self.run(tasks, executor)
+        if failed:
+            raise failed[0].error
+        return [task.result for task in tasks]
+
+    def run(self, tasks, executor=None):
+        """Run a graph of tasks, each once the tasks it comes after are done.
+
+        Of the tasks ready to start, the one with the most work that
+        fits in the budget is started first. The exceptions raised by
+        the tasks are kept in their error instead of being raised, and
+        skip the tasks depending on them or of the same group.
+
+        Parameters
+        ----------
+        tasks : [Task]
+            The tasks to run, including every task they come after.
+        executor : Executor, optional
+            The executor running the tasks, by default a thread pool
+            of workers threads.
+
+        Returns
+        -------
+        [Task]
+            The failed tasks, in the order of tasks.
+
+        Raises
+        ------
+        ValueError
+            If some tasks can never start, as they come after each other
+            or after a task not in tasks.
+        """
+        tasks = list(tasks)
+        queued = sorted(tasks, key=lambda t: t.cost[1], reverse=True)
+        failed = set()
+        running = {}
+        memory = 0
+        self._queued = len(tasks)
+        self._running = 0
+        self._completed = 0
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(ThreadPoolExecutor(self.workers))
+            while queued or running:
+                queued = self._skip(queued, failed)
+                ready = [t for t in queued if t.isReady]
+                while len(running) < self.workers:
+                    task = self._admit(ready, memory, bool(running))
+                    if task is None:
+                        break
+                    queued.remove(task)
+                    memory += task.cost[0]
+                    self._queued -= 1
+                    self._running += 1
+                    task.state = "running"
+                    running[executor.submit(task.func)] = task
+                if not running:
+                    if queued:
+                        raise ValueError("Tasks come after tasks that never run")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    memory -= task.cost[0]
+                    self._running -= 1
+                    self._completed += 1
+                    try:
+                        task.result = future.result()
+                        task.state = "done"
+                    except Exception as e:
+                        task.error = e
+                        task.state = "failed"
+                        if task.group is not None:
+                            failed.add(task.group)
+        return [task for task in tasks if task.state == "failed"]
+
+    def _skip(self, queued, failed):
+        """Skip the queued tasks of failed groups or after failed tasks."""
+        while True:
+            skipped = [
+                t
+                for t in queued
+                if t.isBlocked or (t.group is not None and t.group in failed)
+            ]
+            if not skipped:
+                return queued
+            for task in skipped:
+                task.state = "skipped"
+                self._queued -= 1
+                self._completed += 1
+            queued = [t for t in queued if t.state == "queued"]
+
+    def _admit(self, ready, memory, isRunning):
+        """Remove and return the first ready task that fits, if any."""
+        for k, task in enumerate(ready):
+            fits = self.budget is None or memory + task.cost[0] <= self.budget
+            if fits or not isRunning:
+                return ready.pop(k)
+        return None
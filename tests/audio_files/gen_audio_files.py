@@ -69,23 +69,27 @@ class Generator:
         write(self.path(name), self.get_wavetable(name), sr, subtype)
 
 
+FILES = [
+    "sin-m",
+    "sin-s",
+    "sin.L",
+    "sin.R",
+    "0-m",
+    "0-s",
+    "sin+tri",
+    "sin-r100",
+    "sin-l50",
+    "sin-r25",
+    "empty",
+]
+"""Names of the audio files the tests use."""
+
+
 if __name__ == "__main__":
     wt_gen = Generator()
     dirname = os.path.dirname(os.path.realpath(__file__))
     for f in os.listdir(dirname):
         if f.endswith(".wav"):
             os.remove(os.path.join(dirname, f))
-    for name in [
-        "sin-m",
-        "sin-s",
-        "sin.L",
-        "sin.R",
-        "0-m",
-        "0-s",
-        "sin+tri",
-        "sin-r100",
-        "sin-l50",
-        "sin-r25",
-        "empty",
-    ]:
+    for name in FILES:
         wt_gen.write(name)
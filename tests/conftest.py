@@ -0,0 +1,18 @@
+"""
+Generate the audio files used by the tests
+"""
+import os
+import runpy
+
+# Run rather than import the generator, so that no __pycache__ is written
+# among the audio files the tests list.
+_GENERATOR = runpy.run_path(
+    os.path.join(os.path.dirname(__file__), "audio_files", "gen_audio_files.py")
+)
+
+
+def pytest_sessionstart(session):
+    generator = _GENERATOR["Generator"]()
+    for name in _GENERATOR["FILES"]:
+        if not os.path.exists(generator.path(name)):
+            generator.write(name)
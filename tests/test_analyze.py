@@ -5,6 +5,7 @@ import pytest
 import os
 import numpy as np
 from mppm import SampleblockChannelInfo
+from mppm.analyze import AnalysisStatistics, _pack_flag, analyze_batch
 from soundfile import read
 
 
@@ -13,13 +14,17 @@ class Test_SampleblockChannelInfo(object):
     def obj(self):
         return SampleblockChannelInfo()
 
-    def test_set_channels(self, obj):
-        obj.channelblock = [[0.1], [0.2]]
-        assert obj.set_channels() == 2
-        obj.channelblock = [[0.1, 0.2]]
-        assert obj.set_channels() == 1
-        obj.channelblock = [[0.6721, 0.0391, -0.518], [-0.6968, -0.644, 0.0526]]
-        assert obj.set_channels() == 2
+    @pytest.mark.parametrize(
+        "sampleblock, channels",
+        [
+            pytest.param([[0.1, 0.2]], 2, id="Stereo"),
+            pytest.param([[0.1], [0.2]], 1, id="Mono"),
+            pytest.param([[0.6721, -0.6968], [0.0391, -0.644], [-0.518, 0.0526]], 2),
+        ],
+    )
+    def test_set_channels(self, sampleblock, channels):
+        obj = SampleblockChannelInfo(sampleblock=np.array(sampleblock))
+        assert obj.channels == channels
 
     @pytest.mark.parametrize(
         "sampleblock, result",
@@ -49,14 +54,8 @@ class Test_SampleblockChannelInfo(object):
         assert obj.flag_on("") == 0
         obj.flag = 0
 
-    def test_transpose(self, obj):
-        assert (
-            obj._transpose([[0.1, 0.2], [0.3, 0.6], [0.15, 0.3]])
-            == [[0.1, 0.3, 0.15], [0.2, 0.6, 0.3]]
-        ).all()
-
     @pytest.mark.parametrize(
-        "sample, ratio",
+        "samples, ratio",
         [
             pytest.param([0.5, 0.5], [1], id="Identical"),
             pytest.param([0.22900572, 0.11450286], [0.5], id="Float"),
@@ -64,8 +63,11 @@ class Test_SampleblockChannelInfo(object):
             pytest.param([1, 2, 3, -6], [2, 1.5, -2], id="Multichannel"),
         ],
     )
-    def test_get_ratio(self, obj, sample, ratio):
-        assert obj._get_ratio(sample) == ratio
+    def test_ratio_deviation(self, obj, samples, ratio):
+        sampleblock = np.ones((len(samples), 2))
+        sampleblock[:, 0] = samples
+        expected = max(abs(x - 1) for x in ratio)
+        assert obj._get_ratio_deviation(sampleblock) == pytest.approx(expected)
 
     @pytest.mark.parametrize(
         "ratios, isCorrelated",
@@ -105,8 +107,12 @@ class Test_SampleblockChannelInfo(object):
             ),
         ],
     )
-    def test_is_ratio_correlated(self, obj, ratios, isCorrelated):
-        assert obj._is_ratio_correlated(ratios) == isCorrelated
+    def test_ratio_correlation(self, ratios, isCorrelated):
+        ratios = np.array(ratios, dtype=float)
+        start = np.ones((len(ratios), 1))
+        sampleblock = np.cumprod(np.concatenate((start, ratios), axis=1), axis=1).T
+        obj = SampleblockChannelInfo(sampleblock=sampleblock)
+        assert obj.isCorrelated == isCorrelated
 
     @pytest.mark.parametrize(
         "channelblock, isCorrelated",
@@ -135,8 +141,55 @@ class Test_SampleblockChannelInfo(object):
             ),
         ],
     )
-    def test_is_channelblock_correlated(self, obj, channelblock, isCorrelated):
-        assert obj._is_channelblock_correlated(channelblock) == isCorrelated
+    def test_channelblock_correlation(self, channelblock, isCorrelated):
+        sampleblock = np.array(channelblock, dtype=float).T
+        obj = SampleblockChannelInfo(sampleblock=sampleblock)
+        assert obj.isCorrelated == isCorrelated
+
+    @pytest.mark.parametrize(
+        "sampleblock, isCorrelated",
+        [
+            pytest.param([[0.5, 0.5]] * 3, True, id="FakeStereo"),
+            pytest.param(
+                [[0.22900572, 0.11450286], [0.2323956, 0.1161978], [0, 0]],
+                True,
+                id="PannedMonoWithZero",
+            ),
+            pytest.param([[0.5, -0.25], [-1, 0.5]], True, id="Inverted"),
+            pytest.param(
+                [[0.99996948, 0.99996948], [0.99996948, 0.99804688]],
+                False,
+                id="TrueStereo",
+            ),
+            pytest.param([[0.0, 0.0]] * 3, True, id="Empty"),
+            pytest.param([[0, 0], [0, 1], [0, 0.5]], False, id="Ch2Only"),
+            pytest.param([[1, 0.5], [0.5, 0.250004]], True, id="BelowThreshold"),
+            pytest.param([[1, 0.5], [0.5, 0.25002]], False, id="AboveThreshold"),
+            pytest.param(
+                [[0, 1, 2], [0, 1, 2], [0, -1, -1.5]], False, id="Multichannel"
+            ),
+            pytest.param([[1, 2, -3], [0.5, 1, -1.5]], True, id="FakeMultichannel"),
+        ],
+    )
+    def test_gain_correlation(self, sampleblock, isCorrelated):
+        obj = SampleblockChannelInfo(
+            correlation="gain", sampleblock=np.array(sampleblock, dtype=float)
+        )
+        assert obj.isCorrelated == isCorrelated
+
+    @pytest.mark.parametrize(
+        "sampleblock, gain",
+        [
+            pytest.param([[0.5, 0.25], [1, 0.5]], [1, 0.5], id="Panned"),
+            pytest.param([[0.5, -0.5]], [1, -1], id="Inverted"),
+            pytest.param([[0, 0.5]], None, id="NoValidSample"),
+        ],
+    )
+    def test_gain(self, sampleblock, gain):
+        obj = SampleblockChannelInfo(
+            correlation="gain", sampleblock=np.array(sampleblock, dtype=float)
+        )
+        assert obj.gain == gain
 
     @pytest.mark.parametrize(
         "sample, block, result",
@@ -165,28 +218,10 @@ class Test_SampleblockChannelInfo(object):
             ),
         ],
     )
-    def test_get_sample_from_sampleblock(self, obj, sample, block, result):
-        if sample:
-            obj.sample = sample
-        else:
-            obj.reset_sample()
-            assert obj.sample == []
-        assert obj._get_sample_from_sampleblock(block) == result
-        obj.reset_sample()
-
-    @pytest.mark.parametrize(
-        "sample, result",
-        [
-            pytest.param([0.5, 0.3], False, id="Stereo"),
-            pytest.param([0.5], True, id="Mono"),
-            pytest.param([0.5, 0.5], True, id="FakeStereo"),
-            pytest.param([0, 0], True, id="Zero"),
-            pytest.param([0, 1, -1], False, id="TrueMultichannel"),
-            pytest.param([0.5] * 4, True, id="FakeMultichannel"),
-        ],
-    )
-    def test_is_sample_identical(self, obj, sample, result):
-        assert obj._is_sample_identical(sample) == result
+    def test_set_sample(self, sample, block, result):
+        obj = SampleblockChannelInfo(sample=sample)
+        obj.set_info(np.array(block, dtype=float))
+        assert obj.sample == result
 
     # def test_get_noisefloor_from_channelblock(self, obj):
     #     assert (
@@ -257,3 +292,208 @@ class Test_SampleblockChannelInfo(object):
         assert obj.flag == result[0]
         assert obj.isCorrelated == result[1]
         assert obj.sample == result[2]
+
+    @pytest.mark.parametrize(
+        "frames, channels",
+        [
+            pytest.param(64, 1, id="Mono"),
+            pytest.param(64, 2, id="Stereo"),
+            pytest.param(16, 32, id="32Channels"),
+            pytest.param(1, 3, id="SingleFrame"),
+        ],
+    )
+    def test_set_info_matches_stepwise(self, frames, channels):
+        rng = np.random.default_rng(frames * channels)
+        block = rng.uniform(-1, 1, (frames, channels))
+        block[rng.random(block.shape) < 0.1] = 0
+        obj = SampleblockChannelInfo(sampleblock=block)
+        magnitude = np.absolute(block)
+        assert obj.flag == _pack_flag(magnitude.max(axis=0) >= obj.empty_threshold)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            ratios = np.nan_to_num(block[1:] / block[:-1])
+            deviation = np.absolute(np.diff(ratios, axis=1))
+        assert obj.isCorrelated == (
+            channels < 2 or (deviation < obj.null_threshold).all()
+        )
+        valid = block[np.all(block, axis=1)]
+        sample = valid[np.absolute(valid).max(axis=1).argmax()] if len(valid) else []
+        assert obj.sample == list(sample)
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    @pytest.mark.parametrize("gain", [0.5, None, "pan"])
+    @pytest.mark.parametrize("blocksize", [1, 2, 7, 32, 64])
+    def test_set_info_blocksize_independent(self, correlation, gain, blocksize):
+        rng = np.random.default_rng(blocksize)
+        block = rng.uniform(-1, 1, (64, 2))
+        if gain == "pan":
+            block[:32, 0] *= 0.5
+            block[:32, 1] = block[:32, 0] * 0.5
+            block[32:, 1] = block[32:, 0] * 2
+        elif gain is not None:
+            block[:, 1] = block[:, 0] * gain
+        whole = SampleblockChannelInfo(sampleblock=block, correlation=correlation)
+        obj = SampleblockChannelInfo(correlation=correlation)
+        for i in range(0, len(block), blocksize):
+            obj.set_info(block[i : i + blocksize])
+        assert obj.flag == whole.flag
+        assert obj.isCorrelated == whole.isCorrelated == (gain in (0.5,))
+        assert obj.sample == whole.sample
+        assert obj.frames == whole.frames == 64
+
+    def test_set_info_float32_carry(self):
+        # float32 ratios overflow where float64 ones do not
+        block = np.array([[0.5, 0.5], [1e-38, 2e-38], [1e3, 1e3]], dtype=np.float32)
+        whole = SampleblockChannelInfo(sampleblock=block)
+        obj = SampleblockChannelInfo()
+        obj.set_info(block[:2])
+        obj.set_info(block[2:])
+        assert obj.isCorrelated == whole.isCorrelated
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    def test_set_info_integer(self, correlation):
+        block = np.array(
+            [[0, 0], [-32768, -16384], [16384, 8192], [0, 0], [0, 0]], dtype=np.int16
+        )
+        obj = SampleblockChannelInfo(
+            sampleblock=block[:3], scale=2 ** 15, correlation=correlation
+        )
+        obj.set_info(block[3:])
+        expected = SampleblockChannelInfo(
+            sampleblock=block / 2 ** 15, correlation=correlation
+        )
+        assert obj.flag == expected.flag == 3
+        assert obj.isCorrelated == expected.isCorrelated
+        assert obj.sample == expected.sample == [-1.0, -0.5]
+        assert obj.get_statistics().peaks == [1.0, 0.5]
+
+    def test_set_info_silence(self):
+        obj = SampleblockChannelInfo(flag=None, sampleblock=np.zeros((4, 2)))
+        assert obj.flag == 0
+        assert obj.isCorrelated
+        assert obj.get_statistics().peaks == [0, 0]
+        obj.set_info(np.array([[0.5, 0.0]]))
+        assert obj.isCorrelated is False
+
+    def test_reset_carry(self):
+        obj = SampleblockChannelInfo(sampleblock=np.array([[0.5, 0.25]]))
+        obj.reset_carry()
+        obj.set_info(np.array([[0.5, 0.5]]))
+        assert obj.isCorrelated
+        obj.set_info(np.array([[0.25, 0.5]]))
+        assert not obj.isCorrelated
+
+    @pytest.mark.parametrize("gain", [0.5, None])
+    @pytest.mark.parametrize("bounds", [[0, 64], [0, 1, 64], [0, 20, 21, 40, 64]])
+    def test_merge(self, gain, bounds):
+        rng = np.random.default_rng(len(bounds))
+        block = rng.uniform(-1, 1, (64, 2))
+        block[30:50] = 0
+        if gain is not None:
+            block[:, 1] = block[:, 0] * gain
+        whole = SampleblockChannelInfo(flag=None, sampleblock=block, statistics=True)
+        obj = SampleblockChannelInfo(flag=None, statistics=True)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            other = SampleblockChannelInfo(flag=None, statistics=True)
+            if start:
+                other.set_carry(block[start - 1 : start])
+            other.set_info(block[start:stop])
+            obj.merge(other)
+        assert obj.flag == whole.flag
+        assert obj.isCorrelated == whole.isCorrelated == (gain is not None)
+        assert obj.sample == whole.sample
+        assert obj.frames == whole.frames == 64
+        assert obj.get_statistics().peaks == whole.get_statistics().peaks
+        assert obj.deviation == whole.deviation
+
+    @pytest.mark.parametrize("louder", [0, 1])
+    def test_merge_gain_anchor(self, louder):
+        rng = np.random.default_rng(louder)
+        block = rng.uniform(-1, 1, (64, 2))
+        block[:32, 1] = block[:32, 0] * 0.5
+        block[32:, 1] = block[32:, 0] * 2
+        block[32 * louder : 32 * louder + 32] *= 0.5
+        obj = SampleblockChannelInfo(sampleblock=block[:32], correlation="gain")
+        other = SampleblockChannelInfo(sampleblock=block[32:], correlation="gain")
+        assert obj.isCorrelated and other.isCorrelated
+        obj.merge(other)
+        assert obj.isCorrelated is False
+
+    def test_set_info_reuses_buffers(self):
+        obj = SampleblockChannelInfo(sampleblock=np.ones((8, 2)))
+        buffers = {k: v for k, v in obj._buffers.items()}
+        obj.set_info(np.ones((8, 2)) * 0.5)
+        obj.set_info(np.ones((3, 2)) * 0.25)
+        assert all(obj._buffers[k] is v for k, v in buffers.items())
+
+    @pytest.mark.parametrize(
+        "sampleblock, isSettled",
+        [
+            pytest.param(None, False, id="NoBlock"),
+            pytest.param([[0.5]], True, id="Mono"),
+            pytest.param([[0.0]], False, id="SilentMono"),
+            pytest.param([[0.5, 0.3], [0.2, 0.6]], True, id="Stereo"),
+            pytest.param([[0.5, 0.5], [0.2, 0.2]], False, id="FakeStereo"),
+            pytest.param([[0, 0.5], [0, 0.2]], False, id="HalfEmpty"),
+        ],
+    )
+    def test_isSettled(self, sampleblock, isSettled):
+        if sampleblock is not None:
+            sampleblock = np.array(sampleblock, dtype=float)
+        obj = SampleblockChannelInfo(sampleblock=sampleblock)
+        assert obj.isSettled == isSettled
+
+    def test_pack_flag_many_channels(self):
+        mask = np.zeros(70, dtype=bool)
+        mask[[0, 33, 69]] = True
+        assert _pack_flag(mask) == 1 | 1 << 33 | 1 << 69
+
+
+class Test_AnalysisStatistics(object):
+    @pytest.mark.parametrize(
+        "peaks, deviation, threshold, flag, isCorrelated",
+        [
+            pytest.param(None, 0.0, 0.1, None, None, id="NotAnalyzed"),
+            pytest.param([0.5], 0.0, 0.1, 1, True, id="Mono"),
+            pytest.param([0.5, 0.05], 0.01, 0.1, 1, True, id="QuietRight"),
+            pytest.param([0.5, 0.2], 0.2, 0.1, 3, False, id="Stereo"),
+            pytest.param([0.0, 0.0], 0.0, 0.1, 0, True, id="Empty"),
+        ],
+    )
+    def test_thresholds(self, peaks, deviation, threshold, flag, isCorrelated):
+        obj = AnalysisStatistics(peaks=peaks, deviation=deviation)
+        assert obj.get_flag(threshold) == flag
+        assert obj.get_correlation(threshold) == isCorrelated
+
+    @pytest.mark.parametrize(
+        "statistics, deviation", [(True, 1 / 0.55 - 1), (False, 0.05)]
+    )
+    def test_keep_measuring(self, statistics, deviation):
+        obj = SampleblockChannelInfo(statistics=statistics)
+        obj.set_info(np.array([[1.0, 1.0], [0.5, 0.55]]))
+        obj.set_info(np.array([[0.5, 1.0]]))
+        assert obj.isCorrelated is False
+        assert obj.get_statistics().deviation == pytest.approx(deviation)
+        assert obj.get_statistics().peaks == [1.0, 1.0]
+
+
+@pytest.mark.parametrize("correlation", ["ratio", "gain"])
+@pytest.mark.parametrize("channels", [2, 3])
+def test_analyze_batch(correlation, channels):
+    rng = np.random.default_rng(0)
+    lengths = [16, 1, 9, 0, 12, 16]
+    batch = np.zeros((len(lengths), 16, channels))
+    for i, length in enumerate(lengths):
+        batch[i, :length] = rng.uniform(-1, 1, (length, channels))
+    batch[2, :, 1:] = batch[2, :, :1] * 0.5
+    batch[4, :, 1] = 0
+    batch[5, 3:8] = 0
+    results = analyze_batch(batch, lengths, correlation=correlation)
+    for block, length, result in zip(batch, lengths, results):
+        expected = SampleblockChannelInfo(
+            flag=None, sampleblock=block[:length], correlation=correlation
+        )
+        assert result.frames == length
+        assert result.get_flag(0.00001) == expected.flag
+        assert result.get_correlation(0.00001) == expected.isCorrelated
+        assert result.sample == expected.sample
+        assert result.deviation == expected.get_statistics().deviation
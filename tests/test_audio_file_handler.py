@@ -3,14 +3,18 @@ Tests for 'analyze' module
 """
 import os
 import shutil
+import stat
 
 import numpy as np
 import pytest
 
 from soundfile import SoundFile as sf
 from soundfile import read
+from soundfile import write as sf_write
 
-from mppm import AudioFile
+from mppm import AnalysisRecord, AudioFile
+from mppm.audio_file_handler import _get_blocksize
+from mppm.reader import HandlePool, MemoryMappedReader
 
 
 def get_audio_path(name="", ext=".wav"):
@@ -62,6 +66,20 @@ def audioinfo(request):
         yield info
 
 
+@pytest.mark.parametrize(
+    "frames, channels, samplerate, budget, result",
+    [
+        pytest.param(63, 2, 44100, 2 ** 26, 63, id="ShortFile"),
+        pytest.param(345600000, 32, 96000, 2 ** 26, 65536, id="LongMultichannel"),
+        pytest.param(44100 * 600, 2, 44100, 2 ** 26, 44100 * 23, id="WholeSeconds"),
+        pytest.param(1000, 2, 44100, 1, 1, id="TinyBudget"),
+        pytest.param(0, 2, 44100, 2 ** 26, 1, id="NoFrames"),
+    ],
+)
+def test_get_blocksize(frames, channels, samplerate, budget, result):
+    assert _get_blocksize(frames, channels, samplerate, budget) == result
+
+
 class TestAudioFile:
     @pytest.fixture(
         params=[
@@ -81,6 +99,238 @@ class TestAudioFile:
     def test_analyze(self, each_attribute):
         assert each_attribute[0] == each_attribute[1]
 
+    @pytest.mark.parametrize("blocksize", [1, 2, 7])
+    def test_analyze_blocksize(self, audioinfo, blocksize):
+        with AudioFile(audioinfo.filepath, blocksize=blocksize) as af:
+            assert af.flag == audioinfo.src.flag
+            assert af.isCorrelated == audioinfo.src.isCorrelated
+            assert af.sample == audioinfo.src.sample
+            assert af.validChannel == audioinfo.src.validChannel
+
+    @pytest.mark.parametrize(
+        "blocksize, options, result",
+        [
+            pytest.param(None, {}, 63, id="WholeFile"),
+            pytest.param(None, {"memory_budget": 0.001}, 16, id="Budget"),
+            pytest.param(None, {"blocksize": "None"}, 63, id="OptionNone"),
+            pytest.param(None, {"blocksize": "8"}, 8, id="Option"),
+            pytest.param(4, {"blocksize": "8"}, 4, id="Argument"),
+        ],
+    )
+    def test_blocksize(self, blocksize, options, result):
+        filepath = get_audio_path("sin-s")
+        with AudioFile(filepath, blocksize=blocksize, options=options) as af:
+            assert af.blocksize == result
+            assert af.validChannel == 1
+
+    def test_analyze_gain_correlation(self, audioinfo):
+        with AudioFile(audioinfo.filepath, options={"correlation": "gain"}) as af:
+            assert af.isCorrelated == audioinfo.isCorrelated
+            assert af.validChannel == audioinfo.validChannel
+            if "sin-l50" in audioinfo.shape:
+                assert af.gain == pytest.approx([1, 0.5], abs=1e-6)
+
+    @pytest.mark.parametrize(
+        "filename, frames", [("sin+tri", 8), ("sin-s", 63), ("0-s", 64)],
+    )
+    def test_analyze_early_exit(self, filename, frames):
+        filepath = get_audio_path(filename)
+        options = {"early_exit": True}
+        with AudioFile(filepath, blocksize=8, options=options) as af, AudioFile(
+            filepath
+        ) as full:
+            assert af.analyzedFrames == frames
+            assert full.analyzedFrames == full.frames
+            assert af.flag == full.flag
+            assert af.isCorrelated == full.isCorrelated
+            assert af.validChannel == full.validChannel
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    @pytest.mark.parametrize(
+        "thresholds",
+        [
+            {"null_threshold": -100, "empty_threshold": -100},
+            {"null_threshold": -20, "empty_threshold": -3},
+            {"null_threshold": 0, "empty_threshold": -300},
+            {"null_threshold": -300, "empty_threshold": 0},
+        ],
+    )
+    def test_apply_thresholds(self, audioinfo, correlation, thresholds):
+        options = {"correlation": correlation}
+        with AudioFile(audioinfo.filepath, options=dict(options)) as af:
+            af.update_options(thresholds)
+            assert af.apply_thresholds()
+            with AudioFile(
+                audioinfo.filepath, options={**options, **thresholds}
+            ) as expected:
+                assert af.flag == expected.flag
+                assert af.isCorrelated == expected.isCorrelated
+                assert af.validChannel == expected.validChannel
+
+    @pytest.mark.parametrize(
+        "options", [{"statistics": False}, {"early_exit": True}],
+    )
+    def test_apply_thresholds_incomplete(self, options):
+        with AudioFile(get_audio_path("sin+tri"), blocksize=8, options=options) as af:
+            assert not af.statistics.isComplete
+            assert not af.apply_thresholds()
+
+    @pytest.mark.parametrize(
+        "filename, options, mode, frames",
+        [
+            pytest.param("sin+tri", {}, "triage", 16, id="Stereo"),
+            pytest.param("sin-s", {}, "full", 16 + 63, id="FakeStereo"),
+            pytest.param("0-s", {}, "full", 16 + 64, id="Empty"),
+            pytest.param("sin+tri", {"triage_windows": 16}, "full", 63, id="Short"),
+        ],
+    )
+    def test_analyze_triage(self, filename, options, mode, frames):
+        filepath = get_audio_path(filename)
+        options = {
+            "analysis": "triage",
+            "triage_windows": 4,
+            "triage_window": 4,
+            **options,
+        }
+        with AudioFile(filepath, options=options) as af, AudioFile(filepath) as full:
+            assert af.analysisMode == mode
+            assert af.analyzedFrames == frames
+            assert af.flag == full.flag
+            assert af.isCorrelated == full.isCorrelated
+            assert af.validChannel == full.validChannel
+            assert af.statistics.isComplete == (mode == "full")
+
+    @pytest.mark.parametrize("options", [{}, {"early_exit": True}])
+    def test_analyze_read_ahead(self, audioinfo, options):
+        with AudioFile(
+            audioinfo.filepath, blocksize=5, options={**options, "read_ahead": 2}
+        ) as af, AudioFile(audioinfo.filepath, blocksize=5, options=options) as sf:
+            assert af.analyzedFrames == sf.analyzedFrames
+            assert af.flag == sf.flag
+            assert af.isCorrelated == sf.isCorrelated
+            assert af.sample == sf.sample
+            assert af.validChannel == sf.validChannel
+            assert af.analysisTime > 0
+            assert af.throughput == af.analyzedFrames / af.analysisTime
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"segments": 4},
+            {"segments": 64, "statistics": False},
+            {"segments": 3, "backend": "mmap", "dtype": "native"},
+        ],
+    )
+    def test_analyze_segments(self, audioinfo, options):
+        options = {"delimiter": ".", "blocksize": 8, **options}
+        with AudioFile(audioinfo.filepath, options=options) as f:
+            assert f._get_segments() == min(options["segments"], f.frames // 8)
+            for attribute in ("flag", "isCorrelated", "sample", "validChannel"):
+                assert getattr(f, attribute) == getattr(audioinfo.src, attribute)
+            assert f.analyzedFrames == audioinfo.src.analyzedFrames
+            if options.get("statistics", True):
+                assert f.statistics.peaks == audioinfo.src.statistics.peaks
+                assert f.statistics.deviation == audioinfo.src.statistics.deviation
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    def test_analyze_native_dtype(self, audioinfo, correlation):
+        options = {"dtype": "native", "correlation": correlation}
+        with AudioFile(audioinfo.filepath, blocksize=7, options=options) as af:
+            expected = AudioFile(
+                audioinfo.filepath, options={"correlation": correlation}
+            )
+            assert af.dtype == "int32"
+            assert af.flag == expected.flag
+            assert af.isCorrelated == expected.isCorrelated
+            assert af.sample == expected.sample
+            assert af.validChannel == expected.validChannel
+            assert af.statistics.peaks == expected.statistics.peaks
+
+    @pytest.mark.parametrize("dtype", ["float64", "native"])
+    @pytest.mark.parametrize("analysis", ["full", "triage"])
+    def test_analyze_mmap_backend(self, audioinfo, dtype, analysis):
+        options = {"dtype": dtype, "analysis": analysis, "triage_window": 7}
+        with AudioFile(
+            audioinfo.filepath, blocksize=7, options={**options, "backend": "mmap"}
+        ) as af, AudioFile(audioinfo.filepath, blocksize=7, options=options) as sf:
+            assert isinstance(af.file, MemoryMappedReader)
+            assert af.analyzedFrames == sf.analyzedFrames
+            assert af.flag == sf.flag
+            assert af.isCorrelated == sf.isCorrelated
+            assert af.sample == sf.sample
+            assert af.validChannel == sf.validChannel
+
+    @pytest.mark.parametrize("subtype", ["PCM_16", "PCM_32", "FLOAT"])
+    def test_mmap_views(self, tmp_path, subtype):
+        filepath = os.path.join(tmp_path, "file.wav")
+        data, samplerate = read(get_audio_path("sin+tri"))
+        data[:, 1] = data[:, 0]
+        sf_write(filepath, data, samplerate, subtype)
+        data = read(filepath)[0]
+        options = {"dtype": "native", "backend": "mmap"}
+        with AudioFile(filepath, options=options) as af, AudioFile(filepath) as sf:
+            assert af._isMapped
+            assert af.flag == sf.flag
+            assert af.isCorrelated == sf.isCorrelated
+            assert af.sample == sf.sample
+            assert af.isFakeStereo
+            af.monoize()
+            assert af.channels == 1
+            assert isinstance(af.file, MemoryMappedReader)
+            np.testing.assert_array_equal(read(filepath)[0], data[:, 0])
+
+    @pytest.mark.parametrize(
+        "subtype, dtype",
+        [("PCM_16", "int16"), ("PCM_U8", "int16"), ("FLOAT", "float32")],
+    )
+    def test_native_dtype(self, tmp_path, subtype, dtype):
+        filepath = os.path.join(tmp_path, "file.wav")
+        data, samplerate = read(get_audio_path("sin+tri"))
+        data[:, 1] = data[:, 0] * 0.5
+        sf_write(filepath, data, samplerate, subtype)
+        with AudioFile(filepath, options={"dtype": "native"}) as af, AudioFile(
+            filepath
+        ) as expected:
+            assert af.dtype == dtype
+            assert af.flag == expected.flag
+            assert af.isCorrelated == expected.isCorrelated
+            assert af.sample == expected.sample
+
+    @pytest.mark.parametrize(
+        "subtype, dtype",
+        [
+            ("PCM_U8", "float32"),
+            ("PCM_16", "float32"),
+            ("PCM_24", "float32"),
+            ("PCM_32", "int32"),
+            ("FLOAT", "float32"),
+            ("DOUBLE", "float64"),
+        ],
+    )
+    def test_float32_dtype(self, tmp_path, subtype, dtype):
+        filepath = os.path.join(tmp_path, "file.wav")
+        data, samplerate = read(get_audio_path("sin+tri"))
+        data *= np.random.default_rng(0).uniform(0.5, 1, data.shape)
+        sf_write(filepath, data, samplerate, subtype)
+        rdtype = "int32" if subtype.startswith("PCM") else "float64"
+        source = read(filepath, dtype=rdtype)[0]
+        options = {"dtype": "float32"}
+        with AudioFile(filepath, options=options) as af:
+            assert af.dtype == dtype
+            af.monoize(channel=1)
+            assert af.file.subtype == subtype
+            result = read(filepath, dtype=rdtype)[0]
+            np.testing.assert_array_equal(result, source[:, 1])
+
+        left = os.path.join(tmp_path, "file.L.wav")
+        right = os.path.join(tmp_path, "file.R.wav")
+        sf_write(left, source[:, 0], samplerate, subtype)
+        sf_write(right, source[:, 1], samplerate, subtype)
+        with AudioFile(left, options=options) as af:
+            af.join(others=right)
+            result = read(filepath, dtype=rdtype)[0]
+            np.testing.assert_array_equal(result, source)
+
     def test_empty_file(self):
         with AudioFile(get_audio_path("empty")) as src:
             assert src.flag == None
@@ -102,6 +352,29 @@ class TestAudioFile:
         with AudioFile(get_audio_path("empty"), analyze=False) as obj:
             assert obj.file
 
+    def test_handle_pool(self):
+        pool = HandlePool(2)
+        names = ["sin-m", "sin-s", "sin+tri"]
+        files = [AudioFile(get_audio_path(x), pool=pool) for x in names]
+        assert len(pool) == 2
+        for f, name in zip(files, names):
+            assert f.frames == read(get_audio_path(name))[0].shape[0]
+            assert f.file is not None
+            assert len(list(f.read())[0]) == f.frames
+            assert len(pool) <= 2
+        files[2].close()
+        assert files[2].file is None
+        assert len(pool) == 1
+
+    def test_reopen_missing(self, tmp_file):
+        file, _ = tmp_file
+        pool = HandlePool(1)
+        f = AudioFile(file, pool=pool)
+        AudioFile(get_audio_path("sin-s"), pool=pool)
+        os.remove(file)
+        assert f.file is None
+        assert f.channels == 1
+
     @pytest.mark.parametrize(
         "filename, othernames",
         [
@@ -242,6 +515,40 @@ class TestAudioFile:
                 == result
             )
 
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {"blocksize": 10},
+            {"blocksize": 10, "read_ahead": 2},
+            {"blocksize": 10, "backend": "mmap", "dtype": "native"},
+        ],
+    )
+    @pytest.mark.parametrize("tmp_file", ["sin-l50"], indirect=True)
+    def test_monoize_blocks(self, tmp_file, options):
+        file, testfile = tmp_file
+        os.chmod(file, 0o640)
+        with AudioFile(filepath=file, options={"delimiter": ".", **options}) as obj:
+            obj.monoize()
+            assert obj.channels == 1
+        assert stat.S_IMODE(os.stat(file).st_mode) == 0o640
+        data, _ = read(file, dtype="int32")
+        expected, _ = read(testfile, dtype="int32")
+        np.testing.assert_array_equal(data, expected[:, 0])
+        assert os.listdir(os.path.dirname(file)) == [os.path.basename(file)]
+
+    @pytest.mark.parametrize("tmp_file", ["sin-s", "sin-l50"], indirect=True)
+    def test_monoize_analysis(self, tmp_file, mocker):
+        file, _ = tmp_file
+        analyze = mocker.spy(AudioFile, "analyze")
+        with AudioFile(filepath=file) as obj:
+            obj.monoize()
+            assert analyze.call_count == 1
+            with AudioFile(filepath=file) as expected:
+                for attribute in ("channels", "flag", "validChannel", "sample"):
+                    assert getattr(obj, attribute) == getattr(expected, attribute)
+                assert obj.statistics.peaks == expected.statistics.peaks
+                assert obj.statistics.isComplete
+
     @pytest.mark.parametrize(
         "tmp_file, params, result",
         [
@@ -272,6 +579,28 @@ class TestAudioFile:
         assert os.path.exists(file) != isSplit
         for ch in (".L", ".R"):
             assert os.path.exists(path + ch + ext) == isSplit
+        if isSplit:
+            expected, _ = read(tmp_file[1], always_2d=True)
+            for i, ch in enumerate((".L", ".R")):
+                np.testing.assert_array_equal(read(path + ch + ext)[0], expected[:, i])
+
+    @pytest.mark.parametrize(
+        "params", [{}, {"workers": 3}, {"workers": 3, "remove": False}]
+    )
+    @pytest.mark.parametrize("options", [{}, {"backend": "mmap", "dtype": "native"}])
+    def test_split_channels(self, tmp_path, params, options):
+        data = np.random.default_rng(0).uniform(-1, 1, (1000, 3))
+        file = os.path.join(tmp_path, "drums.wav")
+        sf_write(file, data, 44100, "PCM_24")
+        expected, _ = read(file, dtype="int32")
+        options = {"delimiter": ".", "blocksize": 64, **options}
+        with AudioFile(filepath=file, options=options) as obj:
+            obj.split(**params)
+        assert os.path.exists(file) == (params.get("remove") is False)
+        for i in range(3):
+            newfile = os.path.join(tmp_path, f"drums.{i + 1}.wav")
+            channel, _ = read(newfile, dtype="int32")
+            np.testing.assert_array_equal(channel, expected[:, i])
 
     @pytest.mark.parametrize(
         "params, result",
@@ -396,6 +725,141 @@ class TestAudioFile:
             assert os.path.exists(os.path.join(path, "new.wav"))
             assert all(not os.path.exists(f) for f in (file, file2))
 
+    def test_join_forced_padding(self, tmp_file):
+        file, testfile = tmp_file
+        testpath, _ = os.path.split(testfile)
+        path, _ = os.path.split(file)
+        file2 = os.path.join(path, "empty.wav")
+        shutil.copyfile(os.path.join(testpath, "empty.wav"), file2)
+        with AudioFile(filepath=file) as obj:
+            obj.join(others=file2, forced=True, newfile=os.path.join(path, "new.wav"))
+        data = read(os.path.join(path, "new.wav"), always_2d=True)[0]
+        assert data.shape == (63, 2)
+        assert not data[:, 1].any()
+
+    @pytest.mark.parametrize("replace", [False, True])
+    def test_join_mode(self, tmp_path, replace):
+        files = [os.path.join(tmp_path, f"sin.{c}.wav") for c in "LR"]
+        for file in files:
+            shutil.copyfile(get_audio_path("sin-m"), file)
+            os.chmod(file, 0o640)
+        newfile = files[0] if replace else os.path.join(tmp_path, "sin.wav")
+        umask = os.umask(0)
+        os.umask(umask)
+        with AudioFile(filepath=files[0]) as obj:
+            obj.join(others=files[1:], newfile=newfile)
+        mode = 0o640 if replace else 0o666 & ~umask
+        assert stat.S_IMODE(os.stat(newfile).st_mode) == mode
+
+    @pytest.mark.parametrize("options", [{}, {"backend": "mmap", "dtype": "native"}])
+    def test_join_blocks(self, tmp_path, options):
+        rng = np.random.default_rng(0)
+        data = [rng.uniform(-1, 1, shape) for shape in [(100, 1), (70, 2), (100, 1)]]
+        files = [os.path.join(tmp_path, f"mic.{i + 1}.wav") for i in range(3)]
+        for file, d in zip(files, data):
+            sf_write(file, d, 44100, "PCM_24")
+        expected = [read(f, dtype="int32")[0] for f in files]
+        options = {"delimiter": ".", "blocksize": 16, **options}
+        with AudioFile(filepath=files[0], options=options) as obj:
+            obj.join(others=files[1:], forced=True)
+            assert obj.channels == 4
+        assert os.listdir(tmp_path) == ["mic.wav"]
+        result, _ = read(os.path.join(tmp_path, "mic.wav"), dtype="int32")
+        assert result.shape == (100, 4)
+        np.testing.assert_array_equal(result[:, 0], expected[0])
+        np.testing.assert_array_equal(result[:70, 1:3], expected[1])
+        assert not result[70:, 1:3].any()
+        np.testing.assert_array_equal(result[:, 3], expected[2])
+
+    def test_join_analysis(self, tmp_path, mocker):
+        files = [os.path.join(tmp_path, f"sin.{ch}.wav") for ch in "LR"]
+        for f, name in zip(files, ["sin-m", "0-m"]):
+            data, samplerate = read(get_audio_path(name))
+            sf_write(f, data[:63], samplerate, "PCM_24")
+        analyze = mocker.spy(AudioFile, "analyze")
+        with AudioFile(filepath=files[0]) as obj:
+            obj.join(others=files[1:])
+            assert analyze.call_count == 1
+            assert obj.filepath == os.path.join(tmp_path, "sin.wav")
+            with AudioFile(filepath=obj.filepath) as expected:
+                for attribute in ("channels", "flag", "isCorrelated", "validChannel"):
+                    assert getattr(obj, attribute) == getattr(expected, attribute)
+                assert obj.statistics.peaks == expected.statistics.peaks
+                assert obj.isFakeStereo
+
+    @pytest.mark.parametrize("forced", [False, True])
+    def test_join_samplerate(self, tmp_file, mocker, forced):
+        file, testfile = tmp_file
+        path, _ = os.path.split(file)
+        file2 = os.path.join(path, "sin-m.2.wav")
+        data, samplerate = read(testfile)
+        sf_write(file2, data, samplerate // 2, "PCM_24")
+        analyze = mocker.spy(AudioFile, "analyze")
+        with AudioFile(filepath=file) as obj:
+            assert obj.join(others=file2, forced=forced) is None
+            assert analyze.call_count == 1
+            assert all(os.path.exists(f) for f in (file, file2))
+
+    @pytest.mark.parametrize(
+        "samplerate, frames, forced",
+        [(48000, 63, False), (48000, 63, True), (44100, 40, False)],
+    )
+    def test_join_unprobed(self, tmp_path, samplerate, frames, forced):
+        data, _ = read(get_audio_path("sin-m"))
+        files = [os.path.join(tmp_path, f"sin.{ch}.flac") for ch in "LR"]
+        sf_write(files[0], data, 44100, "PCM_24")
+        sf_write(files[1], data[:frames], samplerate, "PCM_24")
+        with AudioFile(filepath=files[0]) as obj:
+            assert obj.join(others=files[1:], forced=forced) is None
+        assert sorted(os.listdir(tmp_path)) == ["sin.L.flac", "sin.R.flac"]
+
+    @pytest.mark.parametrize(
+        "ext, hours, options, result, newext",
+        [
+            (".wav", 1, {}, "WAV", ".wav"),
+            (".wav", 6, {}, "RF64", ".wav"),
+            (".wav", 6, {"large_format": "W64"}, "W64", ".w64"),
+            (".aiff", 1, {}, "AIFF", ".aiff"),
+            (".aiff", 6, {}, "RF64", ".wav"),
+            (".flac", 6, {}, "FLAC", ".flac"),
+        ],
+    )
+    def test_create_output(self, tmp_path, ext, hours, options, result, newext):
+        filepath = os.path.join(tmp_path, "sin" + ext)
+        data, samplerate = read(get_audio_path("sin-s"))
+        sf_write(filepath, data, samplerate, "PCM_24")
+        with AudioFile(filepath, options={"delimiter": ".", **options}) as obj:
+            frames = samplerate * 3600 * hours
+            newfile = obj._get_output_path(
+                os.path.join(tmp_path, "new" + ext), 2, frames
+            )
+            assert newfile == os.path.join(tmp_path, "new" + newext)
+            with obj._create_output(newfile, 2, frames) as f:
+                assert f.format == result
+                assert f.subtype == "PCM_24"
+
+    @pytest.mark.parametrize("exists", [False, True])
+    def test_monoize_large_extension(self, tmp_path, mocker, exists):
+        filepath = os.path.join(tmp_path, "sin.aiff")
+        data, samplerate = read(get_audio_path("sin-s"))
+        sf_write(filepath, data, samplerate, "PCM_16")
+        newfile = os.path.join(tmp_path, "sin.wav")
+        if exists:
+            shutil.copyfile(get_audio_path("sin-m"), newfile)
+        mocker.patch("mppm.audio_file_handler._MAX_DATA_SIZE", 100)
+        with AudioFile(filepath) as obj:
+            if exists:
+                with pytest.raises(FileExistsError):
+                    obj.monoize()
+                assert sorted(os.listdir(tmp_path)) == ["sin.aiff", "sin.wav"]
+                return
+            obj.monoize()
+            assert obj.filepath == newfile
+            assert obj.channels == 1
+        assert os.listdir(tmp_path) == ["sin.wav"]
+        with sf(newfile) as f:
+            assert f.format == "RF64"
+
     @pytest.mark.parametrize(
         "file, s, result",
         [
@@ -413,3 +877,96 @@ class TestAudioFile:
     def test_get_newfile_path(self, file, s, result):
         with AudioFile(get_audio_path(file)) as af:
             assert af.get_newfile_path(s) == result
+
+
+class TestAnalysisRecord:
+    @pytest.mark.parametrize(
+        "attribute",
+        [
+            "flag",
+            "isCorrelated",
+            "validChannel",
+            "channels",
+            "frames",
+            "samplerate",
+            "isEmpty",
+            "isFakeStereo",
+            "filebase",
+            "channelnum",
+            "action",
+        ],
+    )
+    def test_record(self, audioinfo, attribute):
+        record = AnalysisRecord(audioinfo.src)
+        assert not hasattr(record, "__dict__")
+        assert record == audioinfo.src
+        assert getattr(record, attribute) == getattr(audioinfo.src, attribute)
+
+    def test_apply_thresholds(self):
+        with AudioFile(get_audio_path("sin-r25")) as f:
+            record = AnalysisRecord(f)
+        assert record.isFakeStereo
+        record.update_options({"empty_threshold": 0})
+        assert record.apply_thresholds()
+        assert record.isEmpty
+
+    def test_materialize(self, mocker):
+        pool = HandlePool()
+        with AudioFile(get_audio_path("sin-s"), pool=pool) as f:
+            record = AnalysisRecord(f)
+        assert len(pool) == 0
+        analyze = mocker.spy(AudioFile, "analyze")
+        with record.materialize(pool) as f:
+            assert len(pool) == 0
+            assert f.isFakeStereo
+            assert f.blocksize == 63
+            assert f.file is not None
+            assert len(pool) == 1
+        analyze.assert_not_called()
+
+    def test_analyze(self, mocker):
+        with AudioFile(get_audio_path("sin-s"), options={"statistics": False}) as f:
+            record = AnalysisRecord(f)
+        record.update_options({"empty_threshold": 0})
+        assert not record.apply_thresholds()
+        record.analyze()
+        assert record.isEmpty
+
+    def test_proceed(self, tmp_file):
+        with AudioFile(tmp_file[0]) as f:
+            f.action = "R"
+            record = AnalysisRecord(f)
+        assert record.proceed({"read_only": True}) == "Remove"
+        assert os.path.exists(tmp_file[0])
+        record.proceed()
+        assert not os.path.exists(tmp_file[0])
+
+    def test_proceed_unopened(self, tmp_path, mocker):
+        filepath = os.path.join(tmp_path, "0-s.wav")
+        with open(filepath, "wb") as f:
+            f.write(b"not audio")
+        with AudioFile(filepath) as f:
+            assert f.channels is None
+            assert f.default_action() == "N"
+            f.action = "R"
+            record = AnalysisRecord(f)
+        assert not record.isCurrent
+        shutil.copy(get_audio_path("0-s"), filepath)
+        analyze = mocker.spy(AudioFile, "analyze")
+        with record.materialize() as f:
+            assert f.file is None
+        assert record.proceed() is None
+        analyze.assert_not_called()
+        assert os.path.exists(filepath)
+
+    def test_join_files(self):
+        with AudioFile(get_audio_path("sin.L")) as f, AudioFile(
+            get_audio_path("sin.R")
+        ) as other:
+            f.join_files = [other]
+            record = AnalysisRecord(f)
+        assert record.join_files == [other]
+        assert isinstance(record.join_files[0], AnalysisRecord)
+        with record.materialize() as f:
+            assert isinstance(f.join_files[0], AudioFile)
+            assert f.join_files[0].channels == 1
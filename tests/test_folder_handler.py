@@ -1,7 +1,8 @@
 import os
 import shutil
 import pytest
-from mppm import FileList, AudioFile
+from mppm import AnalysisRecord, FileList, AudioFile
+from mppm import folder_handler
 
 
 def get_audio_path(filename=""):
@@ -66,6 +67,176 @@ class TestFileList:
             )
             assert len(obj[1:3]) == 2
 
+    def test_apply_thresholds(self, mocker):
+        with FileList(get_audio_path(), options={"delimiter": "."}) as fl:
+            before = {f.filepath: f.validChannel for f in fl}
+            analyze = mocker.spy(AudioFile, "analyze")
+            fl.update_options({"empty_threshold": 6})
+            fl.apply_thresholds()
+            assert not analyze.called
+            assert all(f.isEmpty for f in fl)
+            fl.update_options({"empty_threshold": -100})
+            fl.apply_thresholds()
+            assert {f.filepath: f.validChannel for f in fl} == before
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    @pytest.mark.parametrize(
+        "options", [{}, {"memory_budget": 0.01}, {"backend": "mmap"}]
+    )
+    def test_batch(self, correlation, options):
+        options = {"delimiter": ".", "correlation": correlation, **options}
+        with FileList(get_audio_path(), options=dict(options)) as fl, FileList(
+            get_audio_path(), options={**options, "batch": True}
+        ) as batch:
+            assert batch.filepaths == fl.filepaths
+            for f, expected in zip(batch, fl):
+                assert f.channels is not None
+                assert f.channels == expected.channels
+                assert f.flag == expected.flag
+                assert f.isCorrelated == expected.isCorrelated
+                assert f.sample == expected.sample
+                assert f.validChannel == expected.validChannel
+
+    @pytest.mark.parametrize("correlation", ["ratio", "gain"])
+    @pytest.mark.parametrize(
+        "parallel_options", [{"workers": 2}, {"pipeline": True, "analyzers": 2}]
+    )
+    def test_workers(self, correlation, parallel_options):
+        options = {"delimiter": ".", "correlation": correlation}
+        with FileList(get_audio_path(), options=dict(options)) as fl, FileList(
+            get_audio_path(), options={**options, **parallel_options}
+        ) as parallel:
+            assert parallel.filepaths == fl.filepaths
+            for f, expected in zip(parallel, fl):
+                assert f.options == parallel.options
+                assert f.flag == expected.flag
+                assert f.isCorrelated == expected.isCorrelated
+                assert f.sample == expected.sample
+                assert f.validChannel == expected.validChannel
+                assert f.statistics.peaks == expected.statistics.peaks
+            for each in (fl, parallel):
+                each.update_options({"empty_threshold": -3})
+                each.apply_thresholds()
+            assert [f.flag for f in parallel] == [f.flag for f in fl]
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def test_dtype(self, batch):
+        options = {"delimiter": ".", "dtype": "float32", "batch": batch}
+        with FileList(get_audio_path(), options=options) as fl, FileList(
+            get_audio_path(), options={"delimiter": "."}
+        ) as expected:
+            assert all(f.dtype == "float32" for f in fl)
+            for f, e in zip(fl, expected):
+                assert f.flag == e.flag
+                assert f.isCorrelated == e.isCorrelated
+                assert f.validChannel == e.validChannel
+                assert f.sample == pytest.approx(e.sample)
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def test_max_open_files(self, batch):
+        options = {"delimiter": ".", "max_open_files": 2, "batch": batch}
+        with FileList(get_audio_path(), options=options) as fl:
+            assert len(fl) == len(audio_files)
+            assert len(fl._pool) == 0
+            files = [f.materialize(fl._pool) for f in fl]
+            assert all(f.file is not None for f in files)
+            assert len(fl._pool) <= 2
+        assert len(fl._pool) == 0
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def test_records(self, tmp_path, batch):
+        shutil.copy(get_audio_path("0-s.wav"), tmp_path)
+        with FileList(tmp_path, options={"delimiter": ".", "batch": batch}) as fl:
+            assert all(isinstance(f, AnalysisRecord) for f in fl)
+            fl.set_default_action()
+            assert fl.actions == ["Remove"]
+            fl.update_options({"backup": False})
+            fl.proceed()
+            assert not os.listdir(tmp_path)
+
+    def test_update_files(self, tmp_path, mocker):
+        for name in ["sin-s.wav", "0-s.wav", "sin-m.wav"]:
+            shutil.copy(get_audio_path(name), tmp_path)
+        options = {"delimiter": ".", "backup": False}
+        with FileList(tmp_path, options=options) as fl:
+            fl.set_default_action()
+            analyze = mocker.spy(AudioFile, "analyze")
+            fl.proceed()
+            assert analyze.call_count == 0
+            assert sorted(fl.basenames) == ["sin-m.wav", "sin-s.wav"]
+            assert all(f.isMono for f in fl)
+            assert fl.actions == ["None", "None"]
+            os.utime(os.path.join(tmp_path, "sin-m.wav"), ns=(0, 0))
+            fl.update_files()
+            assert analyze.call_count == 1
+            assert all(f.isMono for f in fl)
+
+    def test_update_files_thresholds(self, mocker):
+        with FileList(get_audio_path(), options={"delimiter": "."}) as fl:
+            assert not all(f.isEmpty for f in fl)
+            analyze = mocker.spy(AudioFile, "analyze")
+            fl.update_options({"empty_threshold": 6})
+            fl.update_files()
+            assert not analyze.called
+            assert all(f.isEmpty for f in fl)
+
+    def test_probe(self, mocker):
+        spy = mocker.spy(AudioFile, "analyze")
+        with FileList(get_audio_path()) as fl:
+            infos = fl.probe()
+            assert not spy.called
+            expected = [get_audio_path(f + ".wav") for f in audio_files]
+            assert sorted(infos) == sorted(expected)
+            for f in fl:
+                assert infos[f.filepath].channels == f.channels
+                assert infos[f.filepath].frames == f.frames
+                assert infos[f.filepath].samplerate == f.samplerate
+
+    def test_batch_long_files(self, mocker):
+        spy = mocker.spy(folder_handler, "analyze_batch")
+        options = {"batch": True, "batch_frames": 63}
+        with FileList(get_audio_path(), options=options) as fl:
+            assert len(fl) == len(audio_files)
+            assert sum(len(c.args[1]) for c in spy.call_args_list) == 9
+
+    def test_batch_open_files(self, mocker):
+        handles = []
+        original = folder_handler.open_file
+
+        def open_file(*args):
+            assert all(h.closed for h in handles)
+            handles.append(original(*args))
+            return handles[-1]
+
+        mocker.patch.object(folder_handler, "open_file", open_file)
+        options = {"batch": True, "max_open_files": 1}
+        with FileList(get_audio_path(), options=options) as fl:
+            assert all(f.channels is not None for f in fl)
+            assert len(handles) == len(audio_files)
+
+    def test_batch_no_reopen(self, mocker):
+        load = mocker.spy(AudioFile, "load")
+        with FileList(get_audio_path(), options={"batch": True}) as fl:
+            assert all(f.channels is not None for f in fl)
+            assert not load.called
+
+    def test_batch_short_read(self, mocker):
+        original = folder_handler._probe_file
+
+        def probe_file(filepath):
+            info = original(filepath)
+            if info is not None and filepath.endswith("sin-s.wav"):
+                info.frames += 1
+            return info
+
+        mocker.patch.object(folder_handler, "_probe_file", probe_file)
+        analyze = mocker.spy(AudioFile, "analyze")
+        with FileList(get_audio_path(), options={"batch": True}) as fl:
+            assert [f.frames for f in fl if f.basename == "sin-s.wav"] == [63]
+            assert [c.args[0].basename for c in analyze.call_args_list] == [
+                "sin-s.wav"
+            ]
+
     def test_update_options(self):
         options = {"a": "aa", "b": "bb"}
         with FileList(options=options) as obj:
@@ -78,11 +249,57 @@ class TestFileList:
 
     def test_proceed(self, mocker):
         with FileList(get_audio_path()) as obj:
-            obj.backup = mocker.Mock()
+            obj._backup_file = mocker.Mock()
             obj.update_options({"read_only": True})
             assert "read_only" in obj.options
-            obj.proceed()
-            obj.backup.assert_called()
+            assert obj.proceed() == []
+            assert obj._backup_file.call_count == len(audio_files)
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_proceed_scheduler(self, tmp_path, mocker, workers):
+        for name in ["sin.R.wav", "sin.L.wav", "sin-s.wav", "0-s.wav"]:
+            shutil.copy(get_audio_path(name), tmp_path)
+        options = {"delimiter": ".", "backup": False, "workers": workers}
+        with FileList(tmp_path, options={**options, "memory_limit": 0.01}) as fl:
+            fl.set_default_action()
+            groups = fl._get_action_groups()
+            assert sorted(len(g) for g in groups) == [1, 1, 2]
+            spy = mocker.spy(folder_handler.Scheduler, "run")
+            assert fl.proceed() == []
+            scheduler = spy.call_args_list[0].args[0]
+            assert scheduler.workers == workers
+            assert scheduler.completed == 4
+            assert scheduler.queued == scheduler.running == 0
+            assert sorted(fl.basenames) == ["sin-s.wav", "sin.wav"]
+            assert [f.channels for f in fl if f.basename == "sin.wav"] == [2]
+
+    def test_proceed_max_open_files(self, tmp_path):
+        for i in range(8):
+            shutil.copy(get_audio_path("sin-s.wav"), tmp_path / f"sin-{i}.wav")
+        options = {"backup": False, "workers": 4, "max_open_files": 2, "blocksize": 4}
+        with FileList(tmp_path, options=options) as fl:
+            fl.set_default_action()
+            assert fl.proceed() == []
+            assert [f.channels for f in fl] == [1] * 8
+
+    def test_proceed_failure(self, tmp_path, mocker, caplog):
+        for name in ["sin.R.wav", "sin.L.wav", "sin-s.wav"]:
+            shutil.copy(get_audio_path(name), tmp_path)
+        options = {"delimiter": ".", "workers": 2}
+        with FileList(tmp_path, options=options) as fl:
+            fl.set_default_action()
+            mocker.patch.object(AudioFile, "join", side_effect=OSError("join"))
+            failed = fl.proceed()
+            assert [str(task.error) for task in failed] == ["join"]
+            assert [r.exc_info[1] for r in caplog.records] == [failed[0].error]
+            assert failed[0].group in caplog.text
+            assert sorted(fl.basenames) == ["sin-s.wav", "sin.L.wav", "sin.R.wav"]
+            assert [f.channels for f in fl if f.basename == "sin-s.wav"] == [1]
+            assert sorted(os.listdir(os.path.join(tmp_path, "bak"))) == [
+                "sin-s.wav",
+                "sin.L.wav",
+                "sin.R.wav",
+            ]
 
     @pytest.mark.parametrize(
         "params",
@@ -0,0 +1,70 @@
+"""
+Tests for 'pipeline' module
+"""
+import os
+
+import numpy as np
+import pytest
+from soundfile import write
+
+from mppm import AudioFile
+from mppm.pipeline import analyze_pipeline
+
+audio_path = os.path.join("tests", "audio_files")
+filepaths = sorted(
+    os.path.join(audio_path, f) for f in os.listdir(audio_path) if f.endswith(".wav")
+)
+
+
+def assert_same_analysis(record, options):
+    with AudioFile(record.filepath, options=dict(options)) as expected:
+        assert record.channels == expected.channels
+        assert record.flag == expected.flag
+        assert record.isCorrelated == expected.isCorrelated
+        assert record.sample == expected.sample
+        assert record.validChannel == expected.validChannel
+        if expected.statistics is not None:
+            assert record.statistics.peaks == expected.statistics.peaks
+            assert record.statistics.deviation == expected.statistics.deviation
+            assert record.statistics.isComplete == expected.statistics.isComplete
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"memory_budget": 0.001},
+        {"memory_budget": 0.001, "dtype": "native"},
+        {"memory_budget": 0.001, "backend": "mmap", "dtype": "float32"},
+        {"correlation": "gain"},
+    ],
+)
+@pytest.mark.parametrize("readers, analyzers", [(1, 1), (2, 3)])
+def test_analyze_pipeline(options, readers, analyzers):
+    options = {"delimiter": ".", **options}
+    records = analyze_pipeline(filepaths, dict(options), readers, analyzers)
+    assert [record.filepath for record in records] == filepaths
+    for record in records:
+        assert_same_analysis(record, options)
+
+
+def test_silence(tmp_path):
+    data = np.random.default_rng(0).uniform(-1, 1, (1000, 2))
+    data[200:600] = 0
+    data[700:, 1] = data[700:, 0] * 0.5
+    filepath = os.path.join(tmp_path, "file.wav")
+    write(filepath, data, 44100, "PCM_24")
+    options = {"delimiter": ".", "memory_budget": 0.002}
+    (record,) = analyze_pipeline([filepath], options, 1, 2)
+    assert_same_analysis(record, options)
+
+
+@pytest.mark.parametrize("channels", [1, 64])
+def test_fallback(tmp_path, channels):
+    filepath = os.path.join(tmp_path, "file.wav")
+    write(filepath, np.full((10, channels), 0.5), 44100, "PCM_16")
+    missing = os.path.join(tmp_path, "missing.wav")
+    options = {"delimiter": ".", "memory_budget": 0.001}
+    record, other = analyze_pipeline([filepath, missing], options, 1, 1)
+    assert_same_analysis(record, options)
+    assert other.channels is None
@@ -0,0 +1,90 @@
+"""
+Tests for 'probe' module
+"""
+import os
+import struct
+
+import numpy as np
+import pytest
+from soundfile import SoundFile as sf
+from soundfile import read, write
+
+from mppm.probe import probe
+
+
+@pytest.fixture
+def data():
+    return np.random.default_rng(0).uniform(-1, 1, (1001, 2))
+
+
+@pytest.mark.parametrize(
+    "fmt, ext, subtypes",
+    [
+        ("WAV", ".wav", ["PCM_U8", "PCM_16", "PCM_24", "FLOAT", "ULAW", "ALAW"]),
+        ("WAVEX", ".wav", ["PCM_16", "PCM_32", "DOUBLE"]),
+        ("RF64", ".wav", ["PCM_24", "FLOAT"]),
+        ("W64", ".w64", ["PCM_16", "DOUBLE", "ULAW"]),
+        ("AIFF", ".aiff", ["PCM_S8", "PCM_16", "PCM_24", "FLOAT", "ALAW"]),
+        ("CAF", ".caf", ["PCM_16", "PCM_32", "DOUBLE", "ULAW", "ALAC_16"]),
+    ],
+)
+@pytest.mark.parametrize("endian", ["FILE", "BIG"])
+def test_probe(tmp_path, data, fmt, ext, subtypes, endian):
+    filepath = os.path.join(tmp_path, "file" + ext)
+    for subtype in subtypes:
+        try:
+            write(filepath, data, 48000, subtype, endian, fmt)
+        except ValueError:
+            continue
+        info = probe(filepath)
+        with sf(filepath) as f:
+            assert info.name == filepath
+            assert info.format == f.format
+            assert info.subtype == f.subtype
+            assert info.channels == f.channels
+            assert info.samplerate == f.samplerate
+            assert info.frames == f.frames
+        assert info.duration == pytest.approx(1001 / 48000)
+
+
+@pytest.mark.parametrize("subtype, dtype", [("PCM_16", "i2"), ("FLOAT", "f4")])
+@pytest.mark.parametrize("fmt, ext", [("WAV", ".wav"), ("AIFF", ".aiff")])
+def test_probe_offset(tmp_path, data, subtype, dtype, fmt, ext):
+    filepath = os.path.join(tmp_path, "file" + ext)
+    write(filepath, data, 48000, subtype, format=fmt)
+    info = probe(filepath)
+    order = "<" if info.endian == "LITTLE" else ">"
+    with open(filepath, "rb") as f:
+        f.seek(info.offset)
+        raw = f.read(info.blockalign * info.frames)
+    samples = np.frombuffer(raw, order + dtype).reshape(-1, 2)
+    expected = read(filepath, dtype="int16" if dtype == "i2" else "float32")[0]
+    np.testing.assert_array_equal(samples, expected)
+
+
+def test_probe_large_chunk(tmp_path):
+    """Chunks beyond the first read are reached with further reads."""
+    filepath = os.path.join(tmp_path, "file.wav")
+    samples = np.arange(-50, 50, dtype="<i2")
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, 16000, 2, 16)
+    chunks = (
+        b"JUNK" + struct.pack("<I", 10001) + bytes(10002)
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", samples.nbytes) + samples.tobytes()
+    )
+    with open(filepath, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks)
+    info = probe(filepath)
+    assert (info.subtype, info.channels, info.samplerate) == ("PCM_16", 1, 8000)
+    assert info.frames == 100
+    np.testing.assert_array_equal(read(filepath, dtype="int16")[0], samples)
+    assert info.offset == len(chunks) + 12 - samples.nbytes
+
+
+@pytest.mark.parametrize("content", [b"", b"RIFF\x04\x00\x00\x00WAVE", b"not audio"])
+def test_probe_error(tmp_path, content):
+    filepath = os.path.join(tmp_path, "file.wav")
+    with open(filepath, "wb") as f:
+        f.write(content)
+    with pytest.raises(ValueError):
+        probe(filepath)
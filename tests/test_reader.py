@@ -0,0 +1,237 @@
+"""
+Tests for 'reader' module
+"""
+import os
+import threading
+
+import numpy as np
+import pytest
+from soundfile import SoundFile as sf
+from soundfile import write
+
+from mppm.reader import HandlePool, MemoryMappedReader, open_file, read_ahead
+
+
+@pytest.fixture
+def data():
+    data = np.random.default_rng(0).uniform(-1.2, 1.2, (1000, 3))
+    data[:3] = [[0.5, -1, 1], [0.25, 0.9999, -0.5], [1.5, -1.5, 0]]
+    return data
+
+
+class TestMemoryMappedReader:
+    @pytest.mark.parametrize(
+        "fmt, ext",
+        [
+            ("WAV", ".wav"),
+            ("WAVEX", ".wav"),
+            ("RF64", ".wav"),
+            ("W64", ".w64"),
+            ("AIFF", ".aiff"),
+            ("CAF", ".caf"),
+        ],
+    )
+    @pytest.mark.parametrize(
+        "subtype", ["PCM_U8", "PCM_16", "PCM_24", "PCM_32", "FLOAT", "DOUBLE"]
+    )
+    @pytest.mark.parametrize("endian", ["LITTLE", "BIG"])
+    def test_read(self, tmp_path, data, fmt, ext, subtype, endian):
+        filepath = os.path.join(tmp_path, "file" + ext)
+        try:
+            write(filepath, data, 44100, subtype, endian, fmt)
+        except ValueError:
+            pytest.skip("Combination not supported by soundfile")
+        with MemoryMappedReader(filepath) as reader, sf(filepath) as expected:
+            assert reader.format == expected.format
+            assert reader.subtype == expected.subtype
+            assert reader.frames == expected.frames
+            assert reader.channels == expected.channels
+            assert reader.samplerate == expected.samplerate
+            for dtype in ["float64", "float32", "int32", "int16"]:
+                reader.seek(0)
+                expected.seek(0)
+                if subtype in ("FLOAT", "DOUBLE") and dtype.startswith("int"):
+                    with pytest.raises(TypeError):
+                        reader.read(dtype=dtype)
+                    assert reader.tell() == 0
+                    continue
+                result = reader.read(dtype=dtype)
+                assert result.dtype == dtype
+                np.testing.assert_array_equal(result, expected.read(dtype=dtype))
+
+    @pytest.mark.parametrize("params", [{}, {"overlap": 10}, {"frames": 250}])
+    def test_blocks(self, tmp_path, data, params):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, "PCM_24")
+        with MemoryMappedReader(filepath) as reader, sf(filepath) as expected:
+            reader.seek(5)
+            expected.seek(5)
+            blocks = list(reader.blocks(100, **params))
+            expected_blocks = list(expected.blocks(100, **params))
+            assert len(blocks) == len(expected_blocks)
+            for block, expected_block in zip(blocks, expected_blocks):
+                np.testing.assert_array_equal(block, expected_block)
+            assert reader.tell() == expected.tell()
+
+    def test_blocks_out(self, tmp_path, data):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, "PCM_16")
+        out = np.empty((300, 3), "float32")
+        with MemoryMappedReader(filepath) as reader:
+            blocks = [block.copy() for block in reader.blocks(out=out)]
+            reader.seek(0)
+            expected = reader.read(dtype="float32")
+        assert [len(block) for block in blocks] == [300, 300, 300, 100]
+        np.testing.assert_array_equal(np.concatenate(blocks), expected)
+
+    @pytest.mark.parametrize(
+        "subtype, dtype",
+        [("PCM_16", "int16"), ("PCM_32", "int32"), ("FLOAT", "float32")],
+    )
+    def test_views(self, tmp_path, data, subtype, dtype):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, subtype)
+        with MemoryMappedReader(filepath) as reader:
+            assert reader.dtype == dtype
+            for block in reader.blocks(100, dtype=dtype):
+                assert isinstance(block, np.memmap)
+                assert not block.flags.writeable
+            reader.seek(0)
+            assert not isinstance(reader.read(dtype="float64"), np.memmap)
+
+    def test_empty(self, tmp_path):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, np.empty((0, 2)), 44100, "PCM_16")
+        with MemoryMappedReader(filepath) as reader:
+            assert reader.frames == 0
+            assert reader.read().shape == (0, 2)
+
+    @pytest.mark.parametrize("subtype", ["ULAW", "ALAW"])
+    def test_unsupported(self, tmp_path, data, subtype):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, subtype)
+        with pytest.raises(ValueError):
+            MemoryMappedReader(filepath)
+
+
+@pytest.mark.parametrize(
+    "ext, subtype, backend, result",
+    [
+        (".wav", "PCM_16", "mmap", MemoryMappedReader),
+        (".wav", "PCM_16", "soundfile", sf),
+        (".wav", "ULAW", "mmap", sf),
+        (".flac", "PCM_16", "mmap", sf),
+        (".aiff", "PCM_16", "mmap", MemoryMappedReader),
+        (".caf", "ALAC_16", "mmap", sf),
+    ],
+)
+def test_open_file(tmp_path, data, ext, subtype, backend, result):
+    filepath = os.path.join(tmp_path, "file" + ext)
+    write(filepath, data, 44100, subtype)
+    f = open_file(filepath, backend)
+    assert isinstance(f, result)
+    f.close()
+
+
+def test_open_file_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        open_file(os.path.join(tmp_path, "missing.wav"), "mmap")
+
+
+class TestHandlePool:
+    @pytest.fixture
+    def filepaths(self, tmp_path, data):
+        filepaths = [os.path.join(tmp_path, f"{i}.wav") for i in range(3)]
+        for filepath in filepaths:
+            write(filepath, data, 44100, "PCM_16")
+        return filepaths
+
+    def test_get(self, filepaths):
+        pool = HandlePool(2)
+        handles = [pool.get(i, f) for i, f in enumerate(filepaths)]
+        assert len(pool) == 2
+        assert 0 not in pool
+        assert handles[0].closed
+        assert not any(h.closed for h in handles[1:])
+        assert pool.get(1, filepaths[1]) is handles[1]
+        reopened = pool.get(0, filepaths[0])
+        assert reopened is not handles[0]
+        assert not reopened.closed
+        assert handles[2].closed
+
+    @pytest.mark.parametrize(
+        "backend, result", [("soundfile", sf), ("mmap", MemoryMappedReader)]
+    )
+    def test_get_backend(self, filepaths, backend, result):
+        pool = HandlePool()
+        assert isinstance(pool.get(0, filepaths[0], backend), result)
+
+    def test_get_other_file(self, filepaths):
+        pool = HandlePool()
+        handle = pool.get(0, filepaths[0])
+        other = pool.get(0, filepaths[1])
+        assert handle.closed
+        assert other.name == filepaths[1]
+
+    def test_lease(self, filepaths):
+        pool = HandlePool(1)
+        with pool.lease(0, filepaths[0]) as handle:
+            with pool.lease(0, filepaths[0]) as inner:
+                assert inner is handle
+            others = [pool.get(i, f) for i, f in enumerate(filepaths) if i]
+            assert not handle.closed
+            assert others[0].closed
+            assert len(pool) == 2
+        assert handle.closed
+        assert len(pool) == 1
+        assert not others[1].closed
+
+    def test_put_release(self, filepaths):
+        pool = HandlePool(1)
+        handle = sf(filepaths[0])
+        pool.put(0, handle)
+        assert pool.get(0, filepaths[0]) is handle
+        pool.release(0)
+        assert handle.closed
+        assert len(pool) == 0
+        pool.release(0)
+
+    def test_clear(self, filepaths):
+        pool = HandlePool()
+        handles = [pool.get(i, f) for i, f in enumerate(filepaths)]
+        pool.clear()
+        assert len(pool) == 0
+        assert all(h.closed for h in handles)
+
+
+class TestReadAhead:
+    @pytest.mark.parametrize("depth", [1, 2, 4])
+    @pytest.mark.parametrize("blocksize", [7, 100, 1000, 2000])
+    def test_read_ahead(self, tmp_path, data, depth, blocksize):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, "PCM_24")
+        with sf(filepath) as f:
+            blocks = [b.copy() for b in read_ahead(f, blocksize, 3, "float32", depth)]
+            f.seek(0)
+            expected = list(f.blocks(blocksize, dtype="float32", always_2d=True))
+        assert len(blocks) == len(expected)
+        for block, expected_block in zip(blocks, expected):
+            np.testing.assert_array_equal(block, expected_block)
+
+    def test_close(self, tmp_path, data):
+        filepath = os.path.join(tmp_path, "file.wav")
+        write(filepath, data, 44100, "PCM_16")
+        threads = threading.active_count()
+        with sf(filepath) as f:
+            blocks = read_ahead(f, 10, 3, depth=2)
+            next(blocks)
+            assert threading.active_count() == threads + 1
+            blocks.close()
+            assert threading.active_count() == threads
+            assert f.tell() <= 40
+
+    def test_error(self, mocker):
+        f = mocker.Mock()
+        f.read.side_effect = RuntimeError("read error")
+        with pytest.raises(RuntimeError, match="read error"):
+            list(read_ahead(f, 10, 2))
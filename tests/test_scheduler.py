@@ -0,0 +1,132 @@
+"""
+Tests for 'scheduler' module
+"""
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from mppm.scheduler import Scheduler, Task, estimate_cost
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ((48000, 2, 48000, "PCM_16", {"blocksize": 1024}), (1024 * 64, 96000)),
+        ((100, 2, 48000, "PCM_16", {"blocksize": 1024}), (100 * 64, 200)),
+        ((100, 1, 48000, "FLOAT", {"blocksize": 10, "dtype": "native"}), (160, 100)),
+        ((0, 2, 48000, "PCM_16", {}), (0, 0)),
+        ((None, None, None, None, {}), (0, 0)),
+    ],
+)
+def test_estimate_cost(args, expected):
+    assert estimate_cost(*args) == expected
+
+
+def test_order():
+    started = []
+    scheduler = Scheduler()
+
+    def task(item):
+        assert scheduler.running == 1
+        assert scheduler.queued == 3 - len(started)
+        started.append(item)
+        return item * 2
+
+    costs = [(0, 1), (0, 3), (0, 2), (0, 3)]
+    assert scheduler.map(task, range(4), costs) == [0, 2, 4, 6]
+    assert started == [1, 3, 2, 0]
+    assert scheduler.queued == scheduler.running == 0
+    assert scheduler.completed == 4
+
+
+@pytest.mark.parametrize(
+    "budget, memory, expected",
+    [(None, 5, 4), (10, 5, 2), (10, 6, 1), (10, 20, 1)],
+)
+def test_budget(budget, memory, expected):
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def task(item):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    scheduler = Scheduler(workers=4, budget=budget)
+    scheduler.map(task, range(8), [(memory, 1)] * 8)
+    assert running[1] == expected
+    assert scheduler.completed == 8
+
+
+def test_budget_fills_with_smaller_tasks():
+    started = []
+    event = threading.Event()
+
+    def task(item):
+        started.append(item)
+        if item == 0:
+            event.wait(1)
+        else:
+            event.set()
+
+    costs = [(6, 3), (6, 2), (4, 1)]
+    Scheduler(workers=2, budget=10).map(task, range(3), costs)
+    assert started[:2] == [0, 2]
+
+
+def test_exception():
+    def task(item):
+        if item == 1:
+            raise ValueError(item)
+        return item
+
+    scheduler = Scheduler(workers=2)
+    with pytest.raises(ValueError):
+        scheduler.map(task, range(3), [(0, 1)] * 3)
+
+
+def test_run_graph():
+    finished = []
+
+    def work(name, error=False):
+        if error:
+            raise OSError(name)
+        finished.append(name)
+
+    def task(name, after=(), group=None, error=False, work_=1):
+        return Task(partial(work, name, error), after, (0, work_), group)
+
+    backup = task("backup", group="a")
+    transform = task("transform", [backup], "a", work_=3)
+    remove = task("remove", [transform], "a")
+    failing = task("failing", group="b", error=True, work_=5)
+    skipped = task("skipped", group="b")
+    after = task("after", [failing])
+    tasks = [remove, transform, backup, failing, skipped, after]
+    scheduler = Scheduler()
+    assert scheduler.run(tasks) == [failing]
+    assert str(failing.error) == "failing"
+    assert finished == ["backup", "transform", "remove"]
+    assert [t.state for t in tasks] == [
+        "done",
+        "done",
+        "done",
+        "failed",
+        "skipped",
+        "skipped",
+    ]
+    assert scheduler.completed == len(tasks)
+    assert scheduler.queued == scheduler.running == 0
+
+
+def test_run_cycle():
+    first = Task(lambda: None)
+    second = Task(lambda: None, [first])
+    first.after.append(second)
+    with pytest.raises(ValueError):
+        Scheduler().run([first, second])